@@ -59,6 +59,13 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'game-responses',
+    }
+}
+
 LANGUAGE_CODE = 'zh-hans'
 TIME_ZONE = 'Asia/Shanghai'
 USE_I18N = True
@@ -75,6 +82,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Seconds a browser may reuse game data before revalidating with its ETag
+GAME_CACHE_MAX_AGE = int(os.environ.get('GAME_CACHE_MAX_AGE', 0))
+
 GAME_DATA_DIR = BASE_DIR / 'game_data'
 NOVEL_UPLOAD_DIR = BASE_DIR / 'novels'
 SAVE_DATA_DIR = BASE_DIR / 'saves'
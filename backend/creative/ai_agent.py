@@ -1,55 +1,39 @@
+import hashlib
 import json
 import os
-import requests
-from pathlib import Path
+from .llm_client import get_client, get_provider_config
+from .prompts import registry as prompt_registry
+from .rate_limiter import estimate_tokens, get_scheduler
 
 
 class CreativeAgent:
     
-    PROMPT_DIR = Path(__file__).parent.parent.parent / 'prompts'
+    DEFAULT_SYSTEM_PROMPT = "你是一个游戏内容创作助手，帮助玩家在创造模式下设计和修改游戏内容。"
     
     def __init__(self, api_key, api_provider='deepseek', base_url=None):
         self.api_key = api_key
         self.api_provider = api_provider
         self.base_url = base_url or self._get_default_base_url()
-        self.system_prompt = self._load_system_prompt()
+        self.model = get_provider_config(api_provider)['model']
+        self.client = get_client(api_provider)
         self.conversation_history = []
     
     def _get_default_base_url(self):
-        providers = {
-            'deepseek': 'https://api.deepseek.com/v1',
-            'openai': 'https://api.openai.com/v1',
-        }
-        return providers.get(self.api_provider, providers['deepseek'])
+        return get_provider_config(self.api_provider)['base_url']
     
-    def _load_system_prompt(self):
-        prompt_file = self.PROMPT_DIR / '09-创造模式助手.md'
-        if prompt_file.exists():
-            return prompt_file.read_text(encoding='utf-8')
-        return "你是一个游戏内容创作助手，帮助玩家在创造模式下设计和修改游戏内容。"
+    @property
+    def system_prompt(self):
+        return prompt_registry.get('creative_assistant') or self.DEFAULT_SYSTEM_PROMPT
     
     def _call_api(self, messages):
-        headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Content-Type': 'application/json'
-        }
-        
         data = {
-            'model': 'deepseek-chat' if self.api_provider == 'deepseek' else 'gpt-4',
+            'model': self.model,
             'messages': messages,
             'temperature': 0.7,
             'max_tokens': 4000,
         }
         
-        response = requests.post(
-            f'{self.base_url}/chat/completions',
-            headers=headers,
-            json=data,
-            timeout=60
-        )
-        
-        response.raise_for_status()
-        return response.json()['choices'][0]['message']['content']
+        return self.client.chat_completion(self.api_key, data, base_url=self.base_url, timeout=60)
     
     def chat(self, user_message, game_context=None):
         messages = [
@@ -135,49 +119,36 @@ class CreativeAgent:
 
 class NovelAnalyzer:
     
-    PROMPT_DIR = Path(__file__).parent.parent.parent / 'prompts'
-    
     def __init__(self, api_key, api_provider='deepseek', base_url=None):
         self.api_key = api_key
         self.api_provider = api_provider
         self.base_url = base_url or self._get_default_base_url()
-        self.prompts = self._load_prompts()
+        config = get_provider_config(api_provider)
+        self.model = config['model']
+        self.client = get_client(api_provider)
+        # Several keys may be given as a list or a comma-separated string; requests are spread over them
+        api_keys = api_key if isinstance(api_key, (list, tuple)) else (api_key or '').split(',')
+        self.scheduler = get_scheduler(
+            api_provider,
+            [key.strip() for key in api_keys if key.strip()] or [api_key],
+            config['requests_per_minute'],
+            config['tokens_per_minute'],
+        )
     
     def _get_default_base_url(self):
-        providers = {
-            'deepseek': 'https://api.deepseek.com/v1',
-            'openai': 'https://api.openai.com/v1',
-        }
-        return providers.get(self.api_provider, providers['deepseek'])
+        return get_provider_config(self.api_provider)['base_url']
     
-    def _load_prompts(self):
-        prompts = {}
-        prompt_files = [
-            ('novel_analyzer', '01-小说分析器.md'),
-            ('world_extractor', '02-世界观提取器.md'),
-            ('character_analyzer', '03-角色分析器.md'),
-            ('story_designer', '04-剧情设计器.md'),
-            ('convergence_designer', '05-世界线收束设计.md'),
-            ('attribute_designer', '06-属性系统设计.md'),
-            ('item_designer', '07-物品道具设计.md'),
-            ('exploration_designer', '08-探索系统设计.md'),
-        ]
-        
-        for key, filename in prompt_files:
-            file_path = self.PROMPT_DIR / filename
-            if file_path.exists():
-                prompts[key] = file_path.read_text(encoding='utf-8')
-        
-        return prompts
+    @property
+    def prompts(self):
+        return prompt_registry.all()
+    
+    @property
+    def prompt_versions(self):
+        return prompt_registry.versions()
     
     def _call_api(self, system_prompt, user_message):
-        headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Content-Type': 'application/json'
-        }
-        
         data = {
-            'model': 'deepseek-chat' if self.api_provider == 'deepseek' else 'gpt-4',
+            'model': self.model,
             'messages': [
                 {'role': 'system', 'content': system_prompt},
                 {'role': 'user', 'content': user_message}
@@ -186,15 +157,23 @@ class NovelAnalyzer:
             'max_tokens': 4000,
         }
         
-        response = requests.post(
-            f'{self.base_url}/chat/completions',
-            headers=headers,
-            json=data,
-            timeout=120
-        )
+        # Providers count the completion budget against the token quota as well
+        estimated_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_message) + data['max_tokens']
         
-        response.raise_for_status()
-        return response.json()['choices'][0]['message']['content']
+        return self.client.chat_completion(
+            self.api_key,
+            data,
+            base_url=self.base_url,
+            scheduler=self.scheduler,
+            estimated_tokens=estimated_tokens
+        )
+    
+    def chunk_cache_key(self, chunk_content):
+        return {
+            'content_hash': hashlib.sha256(chunk_content.encode('utf-8')).hexdigest(),
+            'prompt_version': self.prompt_versions.get('novel_analyzer', ''),
+            'model_name': self.model,
+        }
     
     def analyze_chunk(self, chunk_index, chunk_content, accumulated_context):
         system_prompt = self.prompts.get('novel_analyzer', '')
@@ -1,7 +1,9 @@
 import json
 from pathlib import Path
 from game.models import GameProject, AnalysisCache
+from game.story_store import sync_story_tree
 from .ai_agent import NovelAnalyzer
+from .chunk_store import ChunkStore
 
 
 class NovelAnalysisService:
@@ -12,27 +14,11 @@ class NovelAnalysisService:
     def __init__(self, project, api_key, api_provider='deepseek'):
         self.project = project
         self.analyzer = NovelAnalyzer(api_key, api_provider)
-        self.novel_content = self._load_novel()
-        self.total_chunks = len(self.novel_content) // self.CHUNK_SIZE + 1
-    
-    def _load_novel(self):
-        novel_path = self.project.novel_file.path
-        
-        encodings = ['utf-8', 'gbk', 'gb2312', 'utf-16']
-        
-        for encoding in encodings:
-            try:
-                with open(novel_path, 'r', encoding=encoding) as f:
-                    return f.read()
-            except (UnicodeDecodeError, UnicodeError):
-                continue
-        
-        raise ValueError('无法读取小说文件，请检查编码格式')
+        self.store = ChunkStore.open(self.project.novel_file.path)
+        self.total_chunks = self.store.char_count // self.CHUNK_SIZE + 1
     
     def _get_chunk(self, index):
-        start = index * self.CHUNK_SIZE
-        end = start + self.CHUNK_SIZE
-        return self.novel_content[start:end]
+        return self.store.get_chunk(index, self.CHUNK_SIZE)
     
     def _get_accumulated_context(self):
         world_setting = self.project.world_setting or {}
@@ -81,30 +67,39 @@ class NovelAnalysisService:
         
         if not chunk_content.strip():
             self.project.analysis_progress = current_index + 1
-            self.project.save()
+            self.project.save(update_fields=['analysis_progress', 'updated_at'])
             return self.analyze_next_chunk()
         
-        accumulated_context = self._get_accumulated_context()
+        cache_key = self.analyzer.chunk_cache_key(chunk_content)
+        shared = AnalysisCache.objects.filter(parsed=True, **cache_key).only('analysis_result').first()
         
-        analysis_result = self.analyzer.analyze_chunk(
-            current_index,
-            chunk_content,
-            accumulated_context
-        )
+        if shared:
+            analysis_result = shared.analysis_result
+        else:
+            accumulated_context = self._get_accumulated_context()
+            
+            analysis_result = self.analyzer.analyze_chunk(
+                current_index,
+                chunk_content,
+                accumulated_context
+            )
         
         AnalysisCache.objects.update_or_create(
             project=self.project,
             chunk_index=current_index,
             defaults={
                 'chunk_content': chunk_content[:500],
-                'analysis_result': analysis_result
+                'analysis_result': analysis_result,
+                'parsed': 'raw_response' not in analysis_result,
+                **cache_key
             }
         )
         
-        self._update_project_data(analysis_result)
+        changed_fields = self._update_project_data(analysis_result)
         
+        # One write per chunk, limited to the columns that actually changed
         self.project.analysis_progress = current_index + 1
-        self.project.save()
+        self.project.save(update_fields=changed_fields + ['analysis_progress', 'updated_at'])
         
         if (current_index + 1) % self.CHUNKS_PER_SUMMARY == 0:
             self._generate_chapter_summary(current_index)
@@ -118,6 +113,8 @@ class NovelAnalysisService:
         }
     
     def _update_project_data(self, analysis_result):
+        changed_fields = []
+        
         if '新发现' in analysis_result:
             new_data = analysis_result['新发现']
             
@@ -132,6 +129,7 @@ class NovelAnalysisService:
                         'relationship': char.get('与主角关系')
                     }
                 self.project.characters = characters
+                changed_fields.append('characters')
             
             if '新设定' in new_data:
                 world_setting = self.project.world_setting or {}
@@ -141,6 +139,7 @@ class NovelAnalysisService:
                         world_setting[setting_type] = []
                     world_setting[setting_type].append(setting.get('内容'))
                 self.project.world_setting = world_setting
+                changed_fields.append('world_setting')
             
             if '新物品' in new_data:
                 items = self.project.items or {'items': []}
@@ -153,6 +152,7 @@ class NovelAnalysisService:
                         'rarity': item.get('稀有度预估')
                     })
                 self.project.items = items
+                changed_fields.append('items')
             
             if '新地点' in new_data:
                 exploration = self.project.exploration or {'areas': []}
@@ -164,6 +164,7 @@ class NovelAnalysisService:
                         'type': location.get('类型')
                     })
                 self.project.exploration = exploration
+                changed_fields.append('exploration')
         
         if '游戏化潜力' in analysis_result:
             potential = analysis_result['游戏化潜力']
@@ -178,8 +179,9 @@ class NovelAnalysisService:
                     'attributes': potential.get('属性相关', [])
                 })
                 self.project.story_tree = story_tree
+                changed_fields.append('story_tree')
         
-        self.project.save()
+        return changed_fields
     
     def _generate_chapter_summary(self, end_index):
         start_index = max(0, end_index - self.CHUNKS_PER_SUMMARY + 1)
@@ -206,7 +208,7 @@ class NovelAnalysisService:
         
         if isinstance(new_world_data, dict) and 'raw_response' not in new_world_data:
             self.project.world_setting = {**world_setting, **new_world_data}
-            self.project.save()
+            self.project.save(update_fields=['world_setting', 'updated_at'])
     
     def finalize_design(self):
         world_setting = self.project.world_setting or {}
@@ -249,7 +251,8 @@ class NovelAnalysisService:
         
         self.project.analysis_status = 'completed'
         self.project.save()
-        
+        sync_story_tree(self.project)
+
         return {
             'status': 'completed',
             'message': '游戏设计已完成',
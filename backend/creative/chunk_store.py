@@ -0,0 +1,175 @@
+import fcntl
+import mmap
+import os
+import shutil
+import tempfile
+from array import array
+from contextlib import contextmanager
+from .novel_reader import NovelReader, sniff_encoding
+
+
+class ChunkStore:
+    """
+    A novel transcoded in place to UTF-8 with normalized newlines, plus a
+    table of the byte offset of every STRIDE-th character. Reading a
+    character range costs two table lookups and one slice of the mmapped
+    file, whatever the book size.
+
+    Built once at upload; a novel replaced on disk is re-converted on open.
+    Conversions hold an exclusive lock on `{path}.lock`, so services opening
+    the same novel in several processes convert it once.
+    """
+
+    INDEX_SUFFIX = '.idx'
+    LOCK_SUFFIX = '.lock'
+    # The separate UTF-8 copy and its indexes kept by the previous layout
+    LEGACY_SUFFIXES = ('.utf8', '.utf8.idx', '.utf8.index.json')
+    INDEX_VERSION = 2
+    STRIDE = 1024
+    # Index header: version, character count, file size and mtime_ns after transcoding
+    HEADER = 4
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = f'{path}{self.INDEX_SUFFIX}'
+        self._header = None
+
+    @classmethod
+    @contextmanager
+    def _locked(cls, path):
+        with open(f'{path}{cls.LOCK_SUFFIX}', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    @staticmethod
+    def _temp_path(path):
+        # Unique per call, so concurrent or crashed conversions never share a temp file
+        fd, tmp_path = tempfile.mkstemp(prefix=f'{os.path.basename(path)}.', suffix='.tmp', dir=os.path.dirname(path))
+        os.close(fd)
+        return tmp_path
+
+    @classmethod
+    def _remove_legacy_copies(cls, path):
+        for suffix in cls.LEGACY_SUFFIXES:
+            try:
+                os.remove(f'{path}{suffix}')
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def remove_sidecars(cls, path):
+        """Delete the index and lock files kept next to a novel that is being removed."""
+        for suffix in (cls.INDEX_SUFFIX, cls.LOCK_SUFFIX) + cls.LEGACY_SUFFIXES:
+            try:
+                os.remove(f'{path}{suffix}')
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def build(cls, path, encoding=None):
+        """Transcode `path` from `encoding` (sniffed when not given) to UTF-8 and index it."""
+        with cls._locked(path):
+            return cls._build(path, encoding)
+
+    @classmethod
+    def _build(cls, path, encoding=None):
+        store = cls(path)
+        encoding = encoding or sniff_encoding(path)
+        offsets = array('Q')
+        chars = 0
+        written = 0
+
+        tmp_text = cls._temp_path(path)
+        try:
+            with open(tmp_text, 'wb') as out:
+                # iter_text translates \r\n and \r to \n
+                for block in NovelReader(path, encoding).iter_text():
+                    i = 0
+                    while i < len(block):
+                        if chars % cls.STRIDE == 0:
+                            offsets.append(written)
+                        take = min(cls.STRIDE - chars % cls.STRIDE, len(block) - i)
+                        data = block[i:i + take].encode('utf-8')
+                        out.write(data)
+                        written += len(data)
+                        chars += take
+                        i += take
+        except UnicodeError:
+            # The sample looked like `encoding` but the rest of the file is not; the original is left untouched
+            os.remove(tmp_text)
+            raise ValueError(f'小说文件不是有效的{encoding}编码，请转换为UTF-8后重新上传')
+        except BaseException:
+            os.remove(tmp_text)
+            raise
+        offsets.append(written)
+        shutil.copymode(path, tmp_text)
+        os.replace(tmp_text, path)
+
+        stat = os.stat(path)
+        tmp_index = cls._temp_path(store.index_path)
+        with open(tmp_index, 'wb') as f:
+            array('Q', [cls.INDEX_VERSION, chars, stat.st_size, stat.st_mtime_ns]).tofile(f)
+            offsets.tofile(f)
+        os.replace(tmp_index, store.index_path)
+        cls._remove_legacy_copies(path)
+        return store
+
+    @classmethod
+    def open(cls, path):
+        store = cls(path)
+        if not store._fresh():
+            with cls._locked(path):
+                # Another process may have converted the file while this one waited
+                if not store._fresh():
+                    return cls._build(path)
+        cls._remove_legacy_copies(path)
+        return store
+
+    def _fresh(self):
+        try:
+            header = self._read_entries(0, self.HEADER)
+            stat = os.stat(self.path)
+        except (OSError, EOFError):
+            return False
+        if header[0] != self.INDEX_VERSION or (header[2], header[3]) != (stat.st_size, stat.st_mtime_ns):
+            return False
+        self._header = header
+        return True
+
+    def _read_entries(self, start, count):
+        entries = array('Q')
+        with open(self.index_path, 'rb') as f:
+            f.seek(start * entries.itemsize)
+            entries.fromfile(f, count)
+        return entries
+
+    @property
+    def char_count(self):
+        if self._header is None:
+            self._header = self._read_entries(0, self.HEADER)
+        return self._header[1]
+
+    def read(self, start, length):
+        end = min(start + length, self.char_count)
+        if start >= end:
+            return ''
+
+        first = start // self.STRIDE
+        last = -(-end // self.STRIDE)
+        byte_start = self._read_entries(self.HEADER + first, 1)[0]
+        byte_end = self._read_entries(self.HEADER + last, 1)[0]
+
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            text = data[byte_start:byte_end].decode('utf-8')
+        skip = start - first * self.STRIDE
+        return text[skip:skip + end - start]
+
+    def get_chunk(self, index, size):
+        return self.read(index * size, size)
+
+    def count_chunks(self, size):
+        return (self.char_count + size - 1) // size
+
+    def reader(self):
+        """A NovelReader over the transcoded file, for chapter scans and sequential passes."""
+        return NovelReader(self.path, 'utf-8')
@@ -0,0 +1,112 @@
+import json
+import time
+from django.conf import settings
+from game.models import AnalysisJob
+
+
+POLL_INTERVAL = 0.5
+KEEPALIVE_INTERVAL = 15
+# The job row is re-read every this many keepalives, for jobs whose log stopped growing
+STATUS_CHECK_KEEPALIVES = 4
+# Seconds without an event before the stream is closed; EventSource reconnects with Last-Event-ID
+MAX_IDLE = 600
+FINAL_STATUSES = ('completed', 'failed', 'cancelled')
+TERMINAL_STATUSES = FINAL_STATUSES + ('paused',)
+
+
+def events_path(job_id):
+    return settings.GAME_DATA_DIR / 'jobs' / f'{job_id}.events'
+
+
+def publish(job_id, event, data):
+    """
+    Append one event to the job's event log. Workers run in other processes,
+    so the log file (one JSON line per event) is what the SSE stream tails.
+    """
+    path = events_path(job_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    line = json.dumps({'event': event, 'data': data}, ensure_ascii=False, default=str)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(line + '\n')
+
+
+def remove_log(job_id):
+    """Delete the event log of a job that reached a final status; open streams read the status from the job row."""
+    events_path(job_id).unlink(missing_ok=True)
+
+
+def _format(event_id, event, data):
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f'id: {event_id}\nevent: {event}\ndata: {payload}\n\n'
+
+
+def _stored_status(job_id):
+    job = AnalysisJob.objects.filter(id=job_id).values('status', 'error').first()
+    return {'job_id': job_id, 'status': 'cancelled' if job is None else job['status'], 'error': job['error'] if job else ''}
+
+
+def stream_events(job_id, last_event_id=0, initial_status=None):
+    """
+    Server-sent events for a job: replays the log after `last_event_id`, then
+    follows the file until a terminal status event. Only os.stat() is polled;
+    the job row is read when the log is removed (at a final status) and every
+    few keepalives, so a job that never writes its final event still ends the
+    stream. After MAX_IDLE quiet seconds it closes.
+    """
+    path = events_path(job_id)
+    event_id = 0
+    pending = b''
+    log = None
+    keepalive_at = last_event_at = time.monotonic()
+    keepalives = 0
+
+    if initial_status in TERMINAL_STATUSES and not path.exists():
+        yield _format(0, 'status', {'job_id': job_id, 'status': initial_status})
+        return
+
+    try:
+        while True:
+            if log is None:
+                try:
+                    # Kept open, so lines written just before remove_log() are still read
+                    log = open(path, 'rb')
+                except FileNotFoundError:
+                    pass
+
+            data = log.read() if log else b''
+            # A line still being written is picked up on the next pass
+            complete, _, pending = (pending + data).rpartition(b'\n')
+            lines = complete.split(b'\n') if complete else []
+            for position, line in enumerate(lines, 1):
+                event_id += 1
+                entry = json.loads(line)
+                if event_id > last_event_id:
+                    yield _format(event_id, entry['event'], entry['data'])
+                    keepalive_at = last_event_at = time.monotonic()
+                    keepalives = 0
+                # An earlier pause followed by a resume is history, not the end of the stream
+                if (position == len(lines) and entry['event'] == 'status' and
+                        entry['data'].get('status') in TERMINAL_STATUSES):
+                    return
+
+            now = time.monotonic()
+            removed = not path.exists()
+            check = log is not None and removed and not data
+            if now - keepalive_at >= KEEPALIVE_INTERVAL:
+                yield ': keepalive\n\n'
+                keepalive_at = now
+                keepalives += 1
+                check = check or removed or keepalives % STATUS_CHECK_KEEPALIVES == 0
+
+            if check:
+                status = _stored_status(job_id)
+                if status['status'] in TERMINAL_STATUSES:
+                    yield _format(event_id + 1, 'status', status)
+                    return
+
+            if now - last_event_at >= MAX_IDLE:
+                return
+            time.sleep(POLL_INTERVAL)
+    finally:
+        if log is not None:
+            log.close()
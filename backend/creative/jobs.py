@@ -0,0 +1,262 @@
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from django.db import close_old_connections, connection
+from django.utils import timezone
+from game.models import GameProject, AnalysisCache, AnalysisJob
+from game.http_cache import invalidate_project
+from .job_events import publish, remove_log
+from .llm_client import get_provider_config, get_server_api_key
+from .novel_processor import NovelProcessor
+
+
+ACTIVE_STATUSES = ('queued', 'running', 'paused')
+POLL_INTERVAL = 2
+# Seconds between heartbeats while a runner is alive, however long a chunk or the final design takes
+HEARTBEAT_INTERVAL = 30
+# A running job whose worker has not reported for this long is handed to another worker
+STALE_AFTER = timedelta(minutes=10)
+
+
+class JobError(Exception):
+    pass
+
+
+def active_job(project_id):
+    return AnalysisJob.objects.filter(project_id=project_id, status__in=ACTIVE_STATUSES).first()
+
+
+def latest_job(project_id):
+    return AnalysisJob.objects.filter(project_id=project_id).first()
+
+
+def _set_project_status(project_id, status):
+    GameProject.objects.filter(id=project_id).update(analysis_status=status, updated_at=timezone.now())
+
+
+def enqueue_analysis(project, api_provider='deepseek', chapter_mode=False, concurrency=1, resume=False):
+    """With resume=True the job continues after the project's last analysed chunk instead of starting over."""
+    if active_job(project.id):
+        raise JobError('该项目已有进行中的分析任务')
+
+    last_index = None
+    if resume:
+        last_index = AnalysisCache.objects.filter(project=project).order_by('-chunk_index').values_list(
+            'chunk_index', flat=True
+        ).first()
+
+    job = AnalysisJob.objects.create(
+        project=project,
+        api_provider=api_provider,
+        chapter_mode=chapter_mode,
+        concurrency=max(1, concurrency),
+        chunk_index=-1 if last_index is None else last_index
+    )
+    _set_project_status(project.id, 'queued')
+    return job
+
+
+def pause_job(job):
+    # A queued job pauses at once; a running one stops after its current chunk
+    if AnalysisJob.objects.filter(id=job.id, status='queued').update(status='paused'):
+        _set_project_status(job.project_id, 'paused')
+        publish(job.id, 'status', {'job_id': job.id, 'status': 'paused', 'chunk_index': job.chunk_index})
+    elif not AnalysisJob.objects.filter(id=job.id, status='running').update(control='pause'):
+        raise JobError('任务当前无法暂停')
+
+
+def resume_job(job):
+    if not AnalysisJob.objects.filter(id=job.id, status='paused').update(status='queued', control=''):
+        raise JobError('只有已暂停的任务可以继续')
+    _set_project_status(job.project_id, 'queued')
+    # Streams opened from now on must not stop at the earlier paused event
+    publish(job.id, 'status', {'job_id': job.id, 'status': 'queued'})
+
+
+def cancel_job(job):
+    if AnalysisJob.objects.filter(id=job.id, status__in=('queued', 'paused')).update(
+            status='cancelled', finished_at=timezone.now()):
+        _set_project_status(job.project_id, 'cancelled')
+        remove_log(job.id)
+    elif not AnalysisJob.objects.filter(id=job.id, status='running').update(control='cancel'):
+        raise JobError('任务已结束')
+
+
+def claim_next_job(worker):
+    """Atomically move the oldest queued job to running for `worker`, or return None."""
+    now = timezone.now()
+    stale = AnalysisJob.objects.filter(status='running', heartbeat_at__lt=now - STALE_AFTER)
+    for job_id, worker, heartbeat_at in stale.values_list('id', 'worker', 'heartbeat_at'):
+        # A heartbeat landing after the read above keeps the job with its worker
+        AnalysisJob.objects.filter(
+            id=job_id, status='running', worker=worker, heartbeat_at=heartbeat_at
+        ).update(status='queued', worker='')
+
+    candidates = AnalysisJob.objects.filter(status='queued').order_by('created_at').values_list('id', flat=True)
+    for job_id in candidates[:10]:
+        # The conditional update is the lock: only one worker sees a row count of 1
+        claimed = AnalysisJob.objects.filter(id=job_id, status='queued').update(
+            status='running', worker=worker, control='', chunks_done=0,
+            started_at=now, heartbeat_at=now
+        )
+        if claimed:
+            return AnalysisJob.objects.select_related('project').get(id=job_id)
+    return None
+
+
+def job_progress(job):
+    elapsed = (timezone.now() - job.started_at).total_seconds() if job.started_at else 0
+    throughput = job.chunks_done / elapsed if job.status == 'running' and elapsed > 0 else 0
+    remaining = max(job.total_chunks - job.chunk_index - 1, 0)
+
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'control': job.control,
+        'chunk_index': job.chunk_index,
+        'total_chunks': job.total_chunks,
+        'chunks_per_minute': round(throughput * 60, 2),
+        'eta_seconds': round(remaining / throughput) if throughput else None,
+        'worker': job.worker,
+        'error': job.error,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+
+
+class JobRunner:
+    """Runs one claimed AnalysisJob to completion, pause or cancellation."""
+
+    def __init__(self, job):
+        self.job = job
+        self.control = ''
+        self.processor = None
+        self.started = time.monotonic()
+        # Set when the job was requeued and claimed by another worker; this run then stops without writing
+        self.lost = False
+        self._stopped = threading.Event()
+
+    def _owned(self):
+        return AnalysisJob.objects.filter(id=self.job.id, status='running', worker=self.job.worker)
+
+    def _beat(self):
+        try:
+            while not self._stopped.wait(HEARTBEAT_INTERVAL):
+                if not self._owned().update(heartbeat_at=timezone.now()):
+                    self.lost = True
+                    return
+        finally:
+            connection.close()
+
+    def run(self):
+        heartbeat = threading.Thread(target=self._beat, daemon=True)
+        heartbeat.start()
+        try:
+            return self._run()
+        finally:
+            self._stopped.set()
+            heartbeat.join()
+
+    def _run(self):
+        job = self.job
+        api_key = get_server_api_key(job.api_provider)
+        if not api_key:
+            self._finish('failed', error=f'服务器未配置 {get_provider_config(job.api_provider)["api_key_env"]}')
+            _set_project_status(job.project_id, 'failed')
+            return 'failed'
+
+        processor = self.processor = NovelProcessor(job.project, api_key, job.api_provider)
+        resuming = job.chunk_index >= 0
+        publish(job.id, 'status', {'job_id': job.id, 'status': 'running', 'worker': job.worker})
+
+        try:
+            if resuming:
+                processor.save_status('processing')
+            analyze = processor.resume_analysis if resuming else processor.run_full_analysis
+            result = analyze(
+                progress_callback=self.on_progress,
+                chapter_mode=job.chapter_mode,
+                concurrency=job.concurrency,
+                should_stop=self.should_stop
+            )
+            if self.lost:
+                return 'lost'
+            if result.get('status') != 'paused' and resuming:
+                processor.save_game_design(result)
+        except Exception as e:
+            if self.lost:
+                return 'lost'
+            self._finish('failed', error=str(e))
+            _set_project_status(job.project_id, 'failed')
+            return 'failed'
+
+        if result.get('status') == 'paused':
+            if self.control == 'cancel':
+                self._finish('cancelled')
+                _set_project_status(job.project_id, 'cancelled')
+                return 'cancelled'
+            self._owned().update(status='paused', control='', worker='')
+            publish(job.id, 'status', {'job_id': job.id, 'status': 'paused', 'chunk_index': job.chunk_index})
+            return 'paused'
+
+        self._finish('completed')
+        invalidate_project(job.project_id)
+        return 'completed'
+
+    def on_progress(self, progress, chunk_index, total_chunks):
+        self.job.chunk_index = chunk_index
+        self.job.total_chunks = total_chunks
+        self.job.chunks_done += 1
+        self._owned().update(
+            chunk_index=chunk_index,
+            total_chunks=total_chunks,
+            chunks_done=self.job.chunks_done,
+            heartbeat_at=timezone.now()
+        )
+
+        elapsed = time.monotonic() - self.started
+        throughput = self.job.chunks_done / elapsed if elapsed > 0 else 0
+        summaries = self.processor.accumulated_context.get('片段摘要列表') if self.processor else None
+        publish(self.job.id, 'progress', {
+            'job_id': self.job.id,
+            'progress': progress,
+            'chunk_index': chunk_index,
+            'total_chunks': total_chunks,
+            'chunks_per_minute': round(throughput * 60, 2),
+            'eta_seconds': round((total_chunks - chunk_index - 1) / throughput) if throughput else None,
+            '片段摘要': summaries[-1] if summaries else None,
+        })
+
+    def should_stop(self):
+        if self.lost:
+            return True
+        self.control = AnalysisJob.objects.filter(id=self.job.id).values_list('control', flat=True).first() or ''
+        return self.control in ('pause', 'cancel')
+
+    def _finish(self, status, error=''):
+        self._owned().update(status=status, control='', error=error, finished_at=timezone.now())
+        publish(self.job.id, 'status', {'job_id': self.job.id, 'status': status, 'error': error})
+        remove_log(self.job.id)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def run_worker(once=False, poll_interval=POLL_INTERVAL, log=print):
+    """Claim and run jobs until interrupted; with once=True, stop when the queue is empty."""
+    name = worker_name()
+    while True:
+        close_old_connections()
+        job = claim_next_job(name)
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        log(f"▶️ [{name}] 开始分析任务 #{job.id}（项目 {job.project_id}）")
+        status = JobRunner(job).run()
+        log(f"⏹️ [{name}] 任务 #{job.id} 结束: {status}")
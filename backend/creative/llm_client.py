@@ -0,0 +1,117 @@
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+
+PROVIDERS = {
+    'deepseek': {
+        'base_url': 'https://api.deepseek.com/v1',
+        'model': 'deepseek-chat',
+        'api_key_env': 'DEEPSEEK_API_KEY',
+        'connect_timeout': 10,
+        'read_timeout': 120,
+        'requests_per_minute': int(os.environ.get('DEEPSEEK_RPM', 300)),
+        'tokens_per_minute': int(os.environ.get('DEEPSEEK_TPM', 1000000)),
+    },
+    'openai': {
+        'base_url': 'https://api.openai.com/v1',
+        'model': 'gpt-4',
+        'api_key_env': 'OPENAI_API_KEY',
+        'connect_timeout': 10,
+        'read_timeout': 120,
+        'requests_per_minute': int(os.environ.get('OPENAI_RPM', 500)),
+        'tokens_per_minute': int(os.environ.get('OPENAI_TPM', 30000)),
+    },
+}
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def get_provider_config(api_provider):
+    return PROVIDERS.get(api_provider, PROVIDERS['deepseek'])
+
+
+def get_server_api_key(api_provider):
+    # Background analysis jobs use the server's key, so user keys are never written to the database
+    return os.environ.get(get_provider_config(api_provider)['api_key_env'], '')
+
+
+class LLMClient:
+    """
+    Chat-completions transport shared by CreativeAgent and NovelAnalyzer.
+
+    One pooled keep-alive session per provider avoids a TCP+TLS handshake
+    per call, and 429/5xx responses or dropped connections are retried
+    with jittered exponential backoff instead of failing the whole run.
+    """
+
+    POOL_SIZE = int(os.environ.get('LLM_POOL_SIZE', 16))
+    MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 5))
+    BACKOFF_BASE = 1.0
+    BACKOFF_MAX = 60.0
+
+    def __init__(self, api_provider='deepseek', pool_size=None, max_retries=None):
+        self.api_provider = api_provider
+        self.config = get_provider_config(api_provider)
+        self.max_retries = self.MAX_RETRIES if max_retries is None else max_retries
+
+        pool_size = pool_size or self.POOL_SIZE
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def chat_completion(self, api_key, payload, base_url=None, timeout=None, scheduler=None, estimated_tokens=0):
+        url = f"{base_url or self.config['base_url']}/chat/completions"
+        timeout = (self.config['connect_timeout'], timeout or self.config['read_timeout'])
+
+        attempt = 0
+        while True:
+            if scheduler:
+                api_key = scheduler.acquire(estimated_tokens)
+            headers = {
+                'Authorization': f'Bearer {api_key}',
+                'Content-Type': 'application/json'
+            }
+
+            response = None
+            try:
+                response = self.session.post(url, headers=headers, json=payload, timeout=timeout)
+            except requests.ConnectionError:
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response.json()['choices'][0]['message']['content']
+
+            delay = self._backoff(attempt, response)
+            if scheduler and response is not None and response.status_code == 429:
+                # The scheduler waits out the penalty, or moves on to another key
+                scheduler.penalize(api_key, delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.BACKOFF_MAX)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** attempt))
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_provider='deepseek'):
+    with _clients_lock:
+        if api_provider not in _clients:
+            _clients[api_provider] = LLMClient(api_provider)
+        return _clients[api_provider]
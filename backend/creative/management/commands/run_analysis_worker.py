@@ -0,0 +1,35 @@
+import multiprocessing
+from django.core.management.base import BaseCommand
+from django.db import connections
+from creative.jobs import POLL_INTERVAL, run_worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued novel analysis jobs (AnalysisJob) outside the web process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Number of worker processes')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--poll', type=float, default=POLL_INTERVAL, help='Seconds between queue polls')
+
+    def handle(self, *args, **options):
+        log = lambda message: self.stdout.write(message)
+
+        if options['workers'] <= 1:
+            run_worker(once=options['once'], poll_interval=options['poll'], log=log)
+            return
+
+        # Each process opens its own database connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=run_worker, args=(options['once'], options['poll']))
+            for _ in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
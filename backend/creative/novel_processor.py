@@ -1,9 +1,15 @@
+import copy
 import json
-import re
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Generator
+from typing import Generator, Iterable
 from .ai_agent import NovelAnalyzer
-from game.models import GameProject, AnalysisCache
+from django.db import transaction
+from .chunk_store import ChunkStore
+from game.models import GameProject, AnalysisCache, AnalysisCheckpoint
+from game.story_store import sync_story_tree
 
 
 class NovelProcessor:
@@ -11,6 +17,8 @@ class NovelProcessor:
     CHUNK_SIZE = 3000
     SUMMARY_INTERVAL = 10
     VOLUME_INTERVAL = 100
+    CHECKPOINTS_KEPT = 3
+    PROGRESS_FLUSH_INTERVAL = 5
     
     def __init__(self, project: GameProject, api_key: str, api_provider: str = 'deepseek'):
         self.project = project
@@ -34,84 +42,127 @@ class NovelProcessor:
         self.story_summaries = []
         self.discovered_items = []
         self.discovered_locations = []
-    
-    def read_novel(self) -> Generator[tuple[int, str], None, None]:
-        novel_path = self.project.novel_file.path
-        
-        with open(novel_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        content = re.sub(r'\s+', ' ', content)
         
-        total_chars = len(content)
-        chunk_index = 0
-        
-        for i in range(0, total_chars, self.CHUNK_SIZE):
-            chunk = content[i:i + self.CHUNK_SIZE]
+        self.reader = ChunkStore.open(project.novel_file.path).reader() if project.novel_file else None
+        self._progress_flushed_at = 0.0
+    
+    def read_novel(self, start_chunk: int = 0) -> Generator[tuple[int, str], None, None]:
+        chunks = self.reader.iter_chunks(self.CHUNK_SIZE, start=start_chunk)
+        for chunk_index, chunk in enumerate(chunks, start_chunk):
             yield chunk_index, chunk
-            chunk_index += 1
     
-        return (len(content) + self.CHUNK_SIZE - 1) // self.CHUNK_SIZE
+    def get_total_chunks(self) -> int:
+        return self.reader.count_chunks(self.CHUNK_SIZE)
     
-    def read_novel_by_chapters(self) -> Generator[tuple[int, str], None, None]:
-        novel_path = self.project.novel_file.path
-        with open(novel_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
-        # Regex to find chapter headers like "第X章" or "第X回"
-        # We capture the header and the content until the next header
-        pattern = re.compile(r'(第[0-9零一二三四五六七八九十百千]+[章回][^\n]*)')
-        
-        parts = pattern.split(content)
-        # parts[0] is pre-chapter content (intro/preface)
-        # parts[1] is header1, parts[2] is content1, parts[3] is header2, parts[4] is content2...
-        
-        chunk_index = 0
-        
-        # Handle preface if exists
-        if parts[0].strip():
-             yield chunk_index, parts[0]
-             chunk_index += 1
-             
-        for i in range(1, len(parts), 2):
-            header = parts[i]
-            body = parts[i+1] if i+1 < len(parts) else ""
-            full_chapter = header + body
-            
-            # If chapter is too huge, we might still want to split it? 
-            # For now, let's treat the Chapter as the basic unit as requested.
-            yield chunk_index, full_chapter
-            chunk_index += 1
+    def read_novel_by_chapters(self, start_chapter: int = 0) -> Generator[tuple[int, str], None, None]:
+        # Chapters are split on "第X章" / "第X回" headers; a non-empty preface is chunk 0.
+        # Chapters before start_chapter are skipped through the offset index, not re-read.
+        for chapter, text in self.reader.iter_chapters(start_chapter):
+            yield chapter['index'], text
 
     def get_total_chapters(self) -> int:
-        novel_path = self.project.novel_file.path
-        with open(novel_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        pattern = re.compile(r'(第[0-9零一二三四五六七八九十百千]+[章回])')
-        return len(pattern.findall(content))
+        return len(self.reader.scan_chapters())
 
     
     def process_chunk(self, chunk_index: int, chunk_content: str) -> dict:
+        result = self._get_cached_result(chunk_index, chunk_content)
+        
+        if result is None:
+            result = self.analyzer.analyze_chunk(
+                chunk_index,
+                chunk_content,
+                self.accumulated_context
+            )
+            self._store_result(chunk_index, chunk_content, result)
+        
+        self._update_accumulated_context(result)
+        
+        return result
+    
+    def _get_cached_result(self, chunk_index: int, chunk_content: str):
+        # Results are shared across projects by chunk text, prompt version and model,
+        # so re-uploading or re-chunking a novel only pays for chunks that changed.
+        cache_key = self.analyzer.chunk_cache_key(chunk_content)
+        
         cached = AnalysisCache.objects.filter(
             project=self.project,
-            chunk_index=chunk_index
+            chunk_index=chunk_index,
+            **cache_key
         ).first()
         
         if cached:
             return cached.analysis_result
         
-        result = self.analyzer.analyze_chunk(
-            chunk_index,
-            chunk_content,
-            self.accumulated_context
-        )
+        shared = AnalysisCache.objects.filter(parsed=True, **cache_key).only('analysis_result').first()
+        
+        if shared:
+            self._store_result(chunk_index, chunk_content, shared.analysis_result)
+            return shared.analysis_result
         
-        AnalysisCache.objects.create(
+        return None
+    
+    def _store_result(self, chunk_index: int, chunk_content: str, result: dict):
+        AnalysisCache.objects.update_or_create(
             project=self.project,
             chunk_index=chunk_index,
-            chunk_content=chunk_content,
-            analysis_result=result
+            defaults={
+                'chunk_content': chunk_content,
+                'analysis_result': result,
+                'parsed': 'raw_response' not in result,
+                **self.analyzer.chunk_cache_key(chunk_content)
+            }
         )
+    
+    def analyze_ahead(self, reader: Iterable[tuple[int, str]], concurrency: int = 1):
+        # Keeps up to `concurrency` LLM calls in flight but yields them in reader order:
+        # the FIFO of pending futures is the reorder buffer, so collect_chunk() still
+        # folds results into accumulated_context chunk by chunk. Each request sees the
+        # context snapshot taken when it was submitted.
+        pending = deque()
+        pool = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+        
+        try:
+            for chunk_index, chunk_content in reader:
+                pending.append((chunk_index, chunk_content, self._submit_chunk(pool, chunk_index, chunk_content)))
+                
+                if len(pending) >= concurrency:
+                    yield pending.popleft()
+            
+            while pending:
+                yield pending.popleft()
+        finally:
+            # Stopping early (pause, error) drops whatever is still queued
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+    
+    def _submit_chunk(self, pool, chunk_index: int, chunk_content: str) -> Future:
+        cached = self._get_cached_result(chunk_index, chunk_content)
+        
+        if cached is not None:
+            future = Future()
+            future.set_result((cached, True))
+            return future
+        
+        context = copy.deepcopy(self.accumulated_context)
+        
+        def analyze():
+            return self.analyzer.analyze_chunk(chunk_index, chunk_content, context), False
+        
+        if pool:
+            return pool.submit(analyze)
+        
+        future = Future()
+        try:
+            future.set_result(analyze())
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
+    def collect_chunk(self, chunk_index: int, chunk_content: str, future: Future) -> dict:
+        result, cached = future.result()
+        
+        if not cached:
+            self._store_result(chunk_index, chunk_content, result)
         
         self._update_accumulated_context(result)
         
@@ -254,17 +305,19 @@ class NovelProcessor:
             'exploration': exploration,
         }
     
-    def run_full_analysis(self, progress_callback=None, stop_after_chapter=False, chapter_mode=False):
+    def run_full_analysis(self, progress_callback=None, stop_after_chapter=False, chapter_mode=False, concurrency=1,
+                          should_stop=None):
         total_chunks = self.get_total_chapters() if chapter_mode else self.get_total_chunks()
         
-        self.project.analysis_status = 'processing'
-        self.project.save()
+        self.save_status('processing')
+        # A fresh run must not resume from, or be trimmed against, an earlier run's checkpoints
+        self.clear_checkpoints(chapter_mode)
         
         try:
             reader = self.read_novel_by_chapters() if chapter_mode else self.read_novel()
             
-            for chunk_index, chunk_content in reader:
-                result = self.process_chunk(chunk_index, chunk_content)
+            for chunk_index, chunk_content, future in self.analyze_ahead(reader, concurrency):
+                result = self.collect_chunk(chunk_index, chunk_content, future)
                 
                 # In chapter mode, every chunk IS a chapter
                 is_chapter_end = True if chapter_mode else ((chunk_index + 1) % self.SUMMARY_INTERVAL == 0)
@@ -277,9 +330,11 @@ class NovelProcessor:
                 if (chunk_index + 1) % (self.SUMMARY_INTERVAL * self.VOLUME_INTERVAL) == 0:
                     self.generate_volume_summary(chunk_index)
                 
+                if is_chapter_end:
+                    self.save_checkpoint(chunk_index, chapter_mode)
+                
                 progress = int((chunk_index + 1) / total_chunks * 100) if total_chunks > 0 else 0
-                self.project.analysis_progress = progress
-                self.project.save()
+                self.save_progress(progress)
                 
                 if progress_callback:
                     progress_callback(progress, chunk_index, total_chunks)
@@ -287,60 +342,143 @@ class NovelProcessor:
                 # Interactive Mode: Stop after chapter summary
                 # In chapter mode, stop after every chunk (since it's a chapter)
                 # In normal mode, stop after SUMMARY_INTERVAL
-                should_stop = stop_after_chapter and is_chapter_end
-                
-                if should_stop:
-                    self.project.analysis_status = 'paused'
-                    self.project.save()
-                    return {
-                        'status': 'paused', 
-                        'message': f'Paused after Chapter {chunk_index + 1 if chapter_mode else chunk_index // self.SUMMARY_INTERVAL}',
-                        'next_chunk_index': chunk_index + 1
-                    }
+                if (stop_after_chapter and is_chapter_end) or (should_stop and should_stop()):
+                    return self._pause(chunk_index, chapter_mode, is_chapter_end)
 
-            final_design = self.finalize_game_design()
-            
-            self.project.world_setting = final_design['world_setting']
-            self.project.characters = final_design['characters']
-            self.project.story_tree = final_design['story_tree']
-            self.project.attributes = final_design['attributes']
-            self.project.items = final_design['items']
-            self.project.exploration = final_design['exploration']
-            self.project.analysis_status = 'completed'
-            self.project.analysis_progress = 100
-            self.project.save()
-            
-            return final_design
+            return self.save_game_design(self.finalize_game_design())
             
         except Exception as e:
-            self.project.analysis_status = 'failed'
-            self.project.save()
+            self.save_status('failed')
             raise e
     
-    def resume_analysis(self, progress_callback=None, stop_after_chapter=False, chapter_mode=False):
-        last_cache = AnalysisCache.objects.filter(
-            project=self.project
-        ).order_by('-chunk_index').first()
+    def _pause(self, chunk_index: int, chapter_mode: bool, is_chapter_end: bool) -> dict:
+        # A checkpoint is only written at chapter ends; stopping mid-chapter checkpoints
+        # here so that resume_analysis() picks up at the next chunk
+        if not is_chapter_end:
+            self.save_checkpoint(chunk_index, chapter_mode)
+        self.save_status('paused')
+        return {
+            'status': 'paused', 
+            'message': f'Paused after Chapter {chunk_index + 1 if chapter_mode else chunk_index // self.SUMMARY_INTERVAL}',
+            'next_chunk_index': chunk_index + 1
+        }
+    
+    def save_game_design(self, final_design: dict) -> dict:
+        self.project.world_setting = final_design['world_setting']
+        self.project.characters = final_design['characters']
+        self.project.story_tree = final_design['story_tree']
+        self.project.attributes = final_design['attributes']
+        self.project.items = final_design['items']
+        self.project.exploration = final_design['exploration']
+        self.project.analysis_status = 'completed'
+        self.project.analysis_progress = 100
+        self.project.save()
+        sync_story_tree(self.project)
+        
+        return final_design
+    
+    def save_progress(self, progress: int, force: bool = False):
+        # Only the progress column is written, at most every PROGRESS_FLUSH_INTERVAL seconds;
+        # a full save() would rewrite every JSONField on the project for each chunk.
+        self.project.analysis_progress = progress
+        
+        now = time.monotonic()
+        if force or now - self._progress_flushed_at >= self.PROGRESS_FLUSH_INTERVAL:
+            self.project.save(update_fields=['analysis_progress', 'updated_at'])
+            self._progress_flushed_at = now
+    
+    def save_status(self, status: str):
+        self.project.analysis_status = status
+        self.project.save(update_fields=['analysis_status', 'analysis_progress', 'updated_at'])
+        self._progress_flushed_at = time.monotonic()
+    
+    def _rebuild_context(self, start_index: int):
+        # One ordered query streamed in batches, instead of a query per chunk
+        results = AnalysisCache.objects.filter(
+            project=self.project,
+            chunk_index__lt=start_index
+        ).order_by('chunk_index').only('analysis_result')
         
-        start_index = last_cache.chunk_index + 1 if last_cache else 0
+        for cached in results.iterator(chunk_size=500):
+            self._update_accumulated_context(cached.analysis_result)
+    
+    def save_checkpoint(self, chunk_index: int, chapter_mode: bool = False):
+        state = {
+            'accumulated_context': self.accumulated_context,
+            'world_setting': self.world_setting,
+            'characters': self.characters,
+            'story_summaries': self.story_summaries,
+            'discovered_items': self.discovered_items,
+            'discovered_locations': self.discovered_locations,
+        }
         
-        # Populate context from cache logic...
-        for i in range(start_index):
-            cached = AnalysisCache.objects.filter(
+        with transaction.atomic():
+            # Re-created rather than updated, so the id keeps the order checkpoints were written in
+            AnalysisCheckpoint.objects.filter(
                 project=self.project,
-                chunk_index=i
-            ).first()
-            if cached:
-                self._update_accumulated_context(cached.analysis_result)
+                chapter_mode=chapter_mode,
+                chunk_index=chunk_index
+            ).delete()
+            AnalysisCheckpoint.objects.create(
+                project=self.project,
+                chapter_mode=chapter_mode,
+                chunk_index=chunk_index,
+                state=state
+            )
+            
+            # Oldest-written first out, whatever their chunk index
+            stale = AnalysisCheckpoint.objects.filter(
+                project=self.project,
+                chapter_mode=chapter_mode
+            ).order_by('-id').values_list('id', flat=True)[self.CHECKPOINTS_KEPT:]
+            AnalysisCheckpoint.objects.filter(id__in=list(stale)).delete()
+    
+    def clear_checkpoints(self, chapter_mode: bool = False):
+        AnalysisCheckpoint.objects.filter(project=self.project, chapter_mode=chapter_mode).delete()
+    
+    def load_checkpoint(self, chapter_mode: bool = False, before_index: int = None):
+        checkpoints = AnalysisCheckpoint.objects.filter(project=self.project, chapter_mode=chapter_mode)
+        if before_index is not None:
+            checkpoints = checkpoints.filter(chunk_index__lt=before_index)
+        
+        checkpoint = checkpoints.order_by('-id').first()
+        if not checkpoint:
+            return None
+        
+        state = checkpoint.state
+        self.accumulated_context = state['accumulated_context']
+        self.world_setting = state['world_setting']
+        self.characters = state['characters']
+        self.story_summaries = state['story_summaries']
+        self.discovered_items = state['discovered_items']
+        self.discovered_locations = state['discovered_locations']
+        
+        return checkpoint.chunk_index
+    
+    def resume_analysis(self, progress_callback=None, stop_after_chapter=False, chapter_mode=False, concurrency=1,
+                        should_stop=None):
+        checkpoint_index = self.load_checkpoint(chapter_mode)
+        
+        if checkpoint_index is not None:
+            # Chunks analysed after the checkpoint are served from AnalysisCache on the way through
+            start_index = checkpoint_index + 1
+        else:
+            last_index = AnalysisCache.objects.filter(
+                project=self.project
+            ).order_by('-chunk_index').values_list('chunk_index', flat=True).first()
+            
+            start_index = last_index + 1 if last_index is not None else 0
+            
+            self._rebuild_context(start_index)
         
         total_chunks = self.get_total_chapters() if chapter_mode else self.get_total_chunks()
-        reader = self.read_novel_by_chapters() if chapter_mode else self.read_novel()
+        if chapter_mode:
+            reader = self.read_novel_by_chapters(start_index)
+        else:
+            reader = self.read_novel(start_index)
         
-        for chunk_index, chunk_content in reader:
-            if chunk_index < start_index:
-                continue
-            
-            result = self.process_chunk(chunk_index, chunk_content)
+        for chunk_index, chunk_content, future in self.analyze_ahead(reader, concurrency):
+            result = self.collect_chunk(chunk_index, chunk_content, future)
             
             is_chapter_end = True if chapter_mode else ((chunk_index + 1) % self.SUMMARY_INTERVAL == 0)
             
@@ -349,23 +487,20 @@ class NovelProcessor:
                 self.update_world_setting(chunk_index)
                 self.update_characters(chunk_index)
             
+            if (chunk_index + 1) % (self.SUMMARY_INTERVAL * self.VOLUME_INTERVAL) == 0:
+                self.generate_volume_summary(chunk_index)
+            
+            if is_chapter_end:
+                self.save_checkpoint(chunk_index, chapter_mode)
+            
             progress = int((chunk_index + 1) / total_chunks * 100) if total_chunks > 0 else 0
-            self.project.analysis_progress = progress
-            self.project.save()
+            self.save_progress(progress)
             
             if progress_callback:
                 progress_callback(progress, chunk_index, total_chunks)
 
             # Interactive Mode: Stop after chapter summary
-            should_stop = stop_after_chapter and is_chapter_end
-
-            if should_stop:
-                self.project.analysis_status = 'paused'
-                self.project.save()
-                return {
-                    'status': 'paused', 
-                    'message': f'Paused after Chapter {chunk_index + 1 if chapter_mode else chunk_index // self.SUMMARY_INTERVAL}',
-                    'next_chunk_index': chunk_index + 1
-                }
+            if (stop_after_chapter and is_chapter_end) or (should_stop and should_stop()):
+                return self._pause(chunk_index, chapter_mode, is_chapter_end)
         
         return self.finalize_game_design()
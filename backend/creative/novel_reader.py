@@ -0,0 +1,360 @@
+import codecs
+import io
+import json
+import os
+import re
+
+
+CHAPTER_PATTERN = re.compile(r'第[0-9零一二三四五六七八九十百千]+[章回][^\n]*')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+TOKEN_PATTERN = re.compile(r'(?P<space>\s+)|\S+')
+
+# Bytes read from each of the start, middle and end of the file when sniffing
+SNIFF_WINDOW = 16 * 1024
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def _read_windows(path):
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        if size <= 3 * SNIFF_WINDOW:
+            return [f.read()]
+        windows = []
+        for start in (0, (size - SNIFF_WINDOW) // 2, size - SNIFF_WINDOW):
+            f.seek(start)
+            windows.append(f.read(SNIFF_WINDOW))
+        return windows
+
+
+def _is_utf8(window, at_start):
+    if not at_start:
+        # A window cut inside a character starts with up to three continuation bytes
+        window = window[next((i for i, b in enumerate(window[:4]) if not 0x80 <= b <= 0xBF), 0):]
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(window, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _gbk_pair_ratio(window):
+    # GBK/GB18030 text is ASCII plus two-byte pairs: lead 0x81-0xFE, trail 0x40-0xFE (not 0x7F)
+    pairs = valid = 0
+    i = 0
+    while i < len(window) - 1:
+        if window[i] < 0x80:
+            i += 1
+            continue
+        pairs += 1
+        trail = window[i + 1]
+        if 0x81 <= window[i] <= 0xFE and 0x40 <= trail <= 0xFE and trail != 0x7F:
+            valid += 1
+        i += 2
+    return valid / pairs if pairs else 1.0
+
+
+def sniff_encoding(path):
+    """
+    Guess a novel's encoding from a bounded sample (a BOM, or at most three
+    16 KB windows) instead of trial-decoding the whole file. GBK text is read
+    as gb18030, its superset.
+    """
+    windows = _read_windows(path)
+    head = windows[0]
+
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+
+    # Chinese text in UTF-16 without a BOM: every other byte of ASCII and many CJK characters is zero
+    if head and head.count(0) > len(head) // 8:
+        return 'utf-16-le' if head[1::2].count(0) > head[0::2].count(0) else 'utf-16-be'
+
+    if all(_is_utf8(window, i == 0) for i, window in enumerate(windows)):
+        return 'utf-8'
+
+    # Only a window cut inside a pair should miss; binary junk misses far more often
+    if min(_gbk_pair_ratio(window) for window in windows) > 0.99:
+        return 'gb18030'
+
+    raise ValueError('无法识别小说文件编码，请转换为UTF-8或GBK后重新上传')
+
+
+class NovelReader:
+    """
+    Streams a novel file block by block so memory stays bounded by the
+    block size, whatever the size of the book.
+
+    Chapters are located in a single scan that records, for every
+    chapter, its title and byte range in the file. The result is kept in
+    a sidecar index next to the novel, so counting chapters or reading
+    chapter N is a seek rather than a re-split of the whole book. The
+    byte offset where each fixed-size chunk starts is kept there too, so
+    iter_chunks() can start at chunk N.
+    """
+
+    BLOCK_SIZE = 1 << 20
+    INDEX_SUFFIX = '.index.json'
+    INDEX_VERSION = 1
+    # A '第X章' header cut by a block boundary can only start this close to the end
+    HEADER_LOOKBACK = 64
+
+    def __init__(self, path, encoding='utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self._chapters = None
+        self._chunk_offsets = None
+        self._char_counts = {}
+
+    def iter_text(self, newline=None, offset=0):
+        with open(self.path, 'rb') as raw:
+            raw.seek(offset)
+            with io.TextIOWrapper(raw, encoding=self.encoding, newline=newline) as f:
+                while True:
+                    block = f.read(self.BLOCK_SIZE)
+                    if not block:
+                        break
+                    yield block
+
+    def iter_chunks(self, size, normalize_whitespace=True, start=0):
+        """Chunks of `size` characters, from chunk `start` on; normalized chunks seek straight to it."""
+        buffer = ''
+        last_space = False
+        offset = 0
+
+        # A UTF-16/32 stream can only be decoded from its BOM, so those are skipped through
+        if start and normalize_whitespace and codecs.lookup(self.encoding).name not in ('utf-16', 'utf-32'):
+            offsets = self.chunk_offsets(size)
+            if start >= len(offsets):
+                return
+            offset = offsets[start]
+        elif start:
+            skipped = self.iter_chunks(size, normalize_whitespace)
+            for _ in range(start):
+                if next(skipped, None) is None:
+                    return
+            yield from skipped
+            return
+
+        for block in self.iter_text(offset=offset):
+            if normalize_whitespace:
+                block = WHITESPACE_PATTERN.sub(' ', block)
+                # A whitespace run split across two blocks must still collapse to one space
+                if last_space and block.startswith(' '):
+                    block = block[1:]
+                if block:
+                    last_space = block.endswith(' ')
+
+            buffer += block
+            start = 0
+            while len(buffer) - start >= size:
+                yield buffer[start:start + size]
+                start += size
+            buffer = buffer[start:]
+
+        if buffer:
+            yield buffer
+
+    def get_chunk(self, index, size, normalize_whitespace=False):
+        for i, chunk in enumerate(self.iter_chunks(size, normalize_whitespace)):
+            if i == index:
+                return chunk
+        return ''
+
+    def count_chars(self, normalize_whitespace=True):
+        if normalize_whitespace not in self._char_counts:
+            last_space = False
+            total = 0
+            for block in self.iter_text():
+                if normalize_whitespace:
+                    block = WHITESPACE_PATTERN.sub(' ', block)
+                    if last_space and block.startswith(' '):
+                        block = block[1:]
+                    if block:
+                        last_space = block.endswith(' ')
+                total += len(block)
+            self._char_counts[normalize_whitespace] = total
+        return self._char_counts[normalize_whitespace]
+
+    def count_chunks(self, size, normalize_whitespace=True):
+        return (self.count_chars(normalize_whitespace) + size - 1) // size
+
+    @property
+    def index_path(self):
+        return f'{self.path}{self.INDEX_SUFFIX}'
+
+    def scan_chapters(self):
+        if self._chapters is None:
+            index = self._load_index()
+            if index is None:
+                self.build_index()
+            else:
+                self._chapters = index['chapters']
+                self._chunk_offsets = index.get('chunks', {})
+        return self._chapters
+
+    def chunk_offsets(self, size):
+        """Byte offset of the start of every normalized chunk of `size` characters."""
+        self.scan_chapters()
+        key = str(size)
+        if key not in self._chunk_offsets:
+            self._chunk_offsets[key] = self._scan_chunk_offsets(size)
+            self._write_index()
+        return self._chunk_offsets[key]
+
+    def build_index(self):
+        self._chapters = list(self._scan_chapters())
+        self._chunk_offsets = {}
+        self._write_index()
+        return self._chapters
+
+    def _write_index(self):
+        stat = os.stat(self.path)
+        index = {
+            'version': self.INDEX_VERSION,
+            'encoding': self.encoding,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'chapters': self._chapters,
+            'chunks': self._chunk_offsets,
+        }
+
+        tmp_path = f'{self.index_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            stat = os.stat(self.path)
+        except (OSError, ValueError):
+            return None
+
+        # A replaced or re-encoded novel invalidates the index
+        if (index.get('version') != self.INDEX_VERSION
+                or index.get('encoding') != self.encoding
+                or index.get('size') != stat.st_size
+                or index.get('mtime_ns') != stat.st_mtime_ns):
+            return None
+
+        return index
+
+    def _scan_chapters(self):
+        # Scans untranslated text (newline='') so that encoded lengths match the bytes on disk.
+        # Text that can no longer hold a header is folded into `length` and dropped from the
+        # buffer, so memory stays bounded even for a chapter (or preface) of any size.
+        encoder = codecs.getincrementalencoder(self.encoding)()
+        buffer = ''
+        title = None
+        offset = 0
+        length = 0
+        has_content = False
+        index = 0
+
+        def consume(text):
+            nonlocal length, has_content
+            length += len(encoder.encode(text))
+            has_content = has_content or bool(text.strip())
+
+        def close_chapter():
+            nonlocal offset, length, has_content, index
+            chapter = None
+            # The preface only counts as a chapter when it has content
+            if title is not None or has_content:
+                chapter = {'index': index, 'title': title, 'offset': offset, 'length': length}
+                index += 1
+            offset += length
+            length = 0
+            has_content = False
+            return chapter
+
+        def split(match):
+            nonlocal buffer, title
+            consume(buffer[:match.start()])
+            chapter = close_chapter()
+            title = match.group().rstrip('\r')
+            consume(match.group())
+            buffer = buffer[match.end():]
+            return chapter
+
+        for block in self.iter_text(newline=''):
+            buffer += block
+
+            while True:
+                match = CHAPTER_PATTERN.search(buffer)
+                if match and match.end() < len(buffer):
+                    chapter = split(match)
+                    if chapter:
+                        yield chapter
+                    continue
+
+                # Either no header, or one whose line may continue in the next block
+                keep = match.start() if match else max(0, len(buffer) - self.HEADER_LOOKBACK)
+                consume(buffer[:keep])
+                buffer = buffer[keep:]
+                break
+
+        match = CHAPTER_PATTERN.search(buffer)
+        if match:
+            chapter = split(match)
+            if chapter:
+                yield chapter
+
+        consume(buffer)
+        if title is not None or has_content:
+            yield close_chapter()
+
+    def _scan_chunk_offsets(self, size):
+        # Walks the same whitespace-collapsed text iter_chunks() yields. A chunk starting on a
+        # collapsed space starts at the first byte of that whitespace run; \r\n needs no
+        # translation here since it collapses like \n.
+        encoder = codecs.getincrementalencoder(self.encoding)()
+        offsets = []
+        position = 0
+        written = 0
+        last_space = False
+
+        for block in self.iter_text(newline=''):
+            for match in TOKEN_PATTERN.finditer(block):
+                text = match.group()
+                if match.lastgroup == 'space':
+                    if not last_space:
+                        if position % size == 0:
+                            offsets.append(written)
+                        position += 1
+                        last_space = True
+                    written += len(encoder.encode(text))
+                    continue
+
+                last_space = False
+                cursor = 0
+                for boundary in range(-position % size, len(text), size):
+                    written += len(encoder.encode(text[cursor:boundary]))
+                    cursor = boundary
+                    offsets.append(written)
+                written += len(encoder.encode(text[cursor:]))
+                position += len(text)
+
+        return offsets
+
+    def read_chapter(self, index):
+        chapter = self.scan_chapters()[index]
+        with open(self.path, 'rb') as f:
+            return self._read_range(f, chapter)
+
+    def iter_chapters(self, start=0):
+        chapters = self.scan_chapters()
+        with open(self.path, 'rb') as f:
+            for chapter in chapters[start:]:
+                yield chapter, self._read_range(f, chapter)
+
+    def _read_range(self, f, chapter):
+        f.seek(chapter['offset'])
+        text = codecs.decode(f.read(chapter['length']), self.encoding)
+        return text.replace('\r\n', '\n').replace('\r', '\n')
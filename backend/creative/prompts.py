@@ -0,0 +1,94 @@
+import hashlib
+import threading
+import time
+from pathlib import Path
+
+
+PROMPT_DIR = Path(__file__).parent.parent.parent / 'prompts'
+PROMPT_FILES = {
+    'novel_analyzer': '01-小说分析器.md',
+    'world_extractor': '02-世界观提取器.md',
+    'character_analyzer': '03-角色分析器.md',
+    'story_designer': '04-剧情设计器.md',
+    'convergence_designer': '05-世界线收束设计.md',
+    'attribute_designer': '06-属性系统设计.md',
+    'item_designer': '07-物品道具设计.md',
+    'exploration_designer': '08-探索系统设计.md',
+    'creative_assistant': '09-创造模式助手.md',
+}
+# Seconds between mtime checks; an edited prompt is picked up within this window
+CHECK_INTERVAL = 2
+
+
+class PromptRegistry:
+    """
+    Prompt files read once per process and shared by every analyzer and
+    agent. The files are re-read when one of their mtimes changes.
+    """
+
+    def __init__(self, directory=PROMPT_DIR, files=PROMPT_FILES):
+        self.directory = Path(directory)
+        self.files = dict(files)
+        self._lock = threading.Lock()
+        self._mtimes = None
+        self._checked_at = 0
+        self._prompts = {}
+        self._versions = {}
+        self._version = ''
+
+    def _stat(self):
+        mtimes = {}
+        for key, filename in self.files.items():
+            try:
+                mtimes[key] = (self.directory / filename).stat().st_mtime_ns
+            except FileNotFoundError:
+                pass
+        return mtimes
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._mtimes is not None and now - self._checked_at < CHECK_INTERVAL:
+            return
+
+        with self._lock:
+            mtimes = self._stat()
+            self._checked_at = now
+            if mtimes == self._mtimes:
+                return
+
+            prompts = {}
+            for key in mtimes:
+                try:
+                    prompts[key] = (self.directory / self.files[key]).read_text(encoding='utf-8')
+                except FileNotFoundError:
+                    pass
+            versions = {key: hashlib.sha256(text.encode('utf-8')).hexdigest() for key, text in prompts.items()}
+
+            self._prompts = prompts
+            self._versions = versions
+            self._version = hashlib.sha256(
+                ''.join(f'{key}:{versions[key]}\n' for key in sorted(versions)).encode('utf-8')
+            ).hexdigest()
+            self._mtimes = mtimes
+
+    def get(self, key, default=''):
+        self._refresh()
+        return self._prompts.get(key, default)
+
+    def all(self):
+        self._refresh()
+        return self._prompts
+
+    def versions(self):
+        """sha256 of each prompt's text, for cache keys scoped to one prompt."""
+        self._refresh()
+        return self._versions
+
+    @property
+    def version(self):
+        """One hash over every loaded prompt."""
+        self._refresh()
+        return self._version
+
+
+registry = PromptRegistry()
@@ -0,0 +1,94 @@
+import re
+import threading
+import time
+
+
+CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text):
+    # Conservative: one token per CJK character, one per four characters otherwise
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class TokenBucket:
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def consume(self, amount, now):
+        # May go negative: a prompt larger than the bucket is paid back before the next one is admitted
+        self._refill(now)
+        self.tokens -= amount
+
+
+class QuotaScheduler:
+    """
+    Admits LLM requests through per-key request and token buckets so a run
+    stays just under the provider's RPM/TPM quota, and spreads requests over
+    every configured API key by always picking the key that frees up first.
+    """
+
+    HEADROOM = 0.9
+
+    def __init__(self, api_keys, requests_per_minute, tokens_per_minute):
+        self.api_keys = list(api_keys)
+        self.lock = threading.Lock()
+        self.request_buckets = {
+            key: TokenBucket(requests_per_minute * self.HEADROOM) for key in self.api_keys
+        }
+        self.token_buckets = {
+            key: TokenBucket(tokens_per_minute * self.HEADROOM) for key in self.api_keys
+        }
+        self.blocked_until = {key: 0.0 for key in self.api_keys}
+        self.limit_hits = 0
+
+    def _wait_time(self, key, tokens, now):
+        return max(
+            self.request_buckets[key].wait_time(1, now),
+            self.token_buckets[key].wait_time(tokens, now),
+            self.blocked_until[key] - now,
+        )
+
+    def acquire(self, tokens):
+        with self.lock:
+            now = time.monotonic()
+            key = min(self.api_keys, key=lambda k: self._wait_time(k, tokens, now))
+            wait = self._wait_time(key, tokens, now)
+            self.request_buckets[key].consume(1, now)
+            self.token_buckets[key].consume(tokens, now)
+
+        if wait > 0:
+            time.sleep(wait)
+        return key
+
+    def penalize(self, key, seconds):
+        # Called on a 429: keep the key out of rotation until the provider's window resets
+        with self.lock:
+            self.limit_hits += 1
+            self.blocked_until[key] = max(self.blocked_until[key], time.monotonic() + seconds)
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(api_provider, api_keys, requests_per_minute, tokens_per_minute):
+    # Shared per provider and key set so every analyzer in the process draws on the same quota
+    cache_key = (api_provider, tuple(api_keys))
+    with _schedulers_lock:
+        if cache_key not in _schedulers:
+            _schedulers[cache_key] = QuotaScheduler(api_keys, requests_per_minute, tokens_per_minute)
+        return _schedulers[cache_key]
@@ -0,0 +1,186 @@
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from game.models import GameProject, AnalysisCache, AnalysisCheckpoint, AnalysisJob
+from .novel_processor import NovelProcessor
+
+
+class FakeAnalyzer:
+    """Stands in for NovelAnalyzer: no LLM calls, and records the chunks it was asked to analyse."""
+
+    model = 'fake'
+
+    def __init__(self):
+        self.analyzed = []
+
+    def chunk_cache_key(self, chunk_content):
+        return {'content_hash': str(hash(chunk_content)), 'prompt_version': '', 'model_name': self.model}
+
+    def analyze_chunk(self, chunk_index, chunk_content, accumulated_context):
+        self.analyzed.append(chunk_index)
+        return {'片段摘要': {'核心事件': f'事件{chunk_index}'}, '新发现': {'新角色': [{'名称': f'角色{chunk_index}'}]}}
+
+    def extract_world_setting(self, *args):
+        return {}
+
+    def analyze_characters(self, *args):
+        return {}
+
+    def design_story(self, *args):
+        return {'chapters': []}
+
+    design_convergence = design_attributes = design_items = design_exploration = design_story
+
+
+class AnalysisTestCase(TestCase):
+    CHUNK_SIZE = 20
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.project = GameProject.objects.create(name='测试小说')
+        text = ''.join(f'第{i}段，这里是测试用的正文内容。' for i in range(1, 40))
+        self.project.novel_file.save('novel.txt', ContentFile(text.encode('utf-8')))
+
+    def processor(self):
+        processor = NovelProcessor(self.project, 'test-key')
+        processor.CHUNK_SIZE = self.CHUNK_SIZE
+        processor.analyzer = FakeAnalyzer()
+        return processor
+
+
+class CheckpointTests(AnalysisTestCase):
+
+    def add_stale_checkpoints(self, *indexes):
+        for index in indexes:
+            AnalysisCheckpoint.objects.create(
+                project=self.project, chapter_mode=False, chunk_index=index,
+                state={
+                    'accumulated_context': {'stale': True}, 'world_setting': {}, 'characters': {},
+                    'story_summaries': [], 'discovered_items': [], 'discovered_locations': [],
+                }
+            )
+
+    def test_save_after_higher_index_stale_checkpoints_then_resume(self):
+        self.add_stale_checkpoints(479, 489, 499)
+        processor = self.processor()
+        processor.save_checkpoint(9)
+
+        indexes = AnalysisCheckpoint.objects.filter(project=self.project).values_list('chunk_index', flat=True)
+        self.assertIn(9, indexes)
+        self.assertEqual(len(indexes), NovelProcessor.CHECKPOINTS_KEPT)
+
+        resumed = self.processor()
+        self.assertEqual(resumed.load_checkpoint(), 9)
+        self.assertNotIn('stale', resumed.accumulated_context)
+
+        resumed.resume_analysis()
+        self.assertEqual(resumed.analyzer.analyzed[0], 10)
+
+    def test_fresh_run_clears_earlier_checkpoints(self):
+        self.add_stale_checkpoints(479, 489, 499)
+        processor = self.processor()
+        result = processor.run_full_analysis(stop_after_chapter=True)
+
+        self.assertEqual(result['next_chunk_index'], 10)
+        self.assertEqual(
+            list(AnalysisCheckpoint.objects.filter(project=self.project).values_list('chunk_index', flat=True)), [9]
+        )
+        self.assertEqual(self.processor().load_checkpoint(), 9)
+
+
+class ChunkResumeTests(AnalysisTestCase):
+
+    def test_resume_seeks_to_the_stored_chunk_offset(self):
+        processor = self.processor()
+        chunks = list(processor.read_novel())
+        self.assertEqual(list(processor.read_novel(10)), chunks[10:])
+
+        offsets = processor.reader.chunk_offsets(self.CHUNK_SIZE)
+        self.assertEqual(len(offsets), len(chunks))
+        with mock.patch.object(processor.reader, 'iter_text', wraps=processor.reader.iter_text) as iter_text:
+            self.assertEqual(next(processor.read_novel(10)), chunks[10])
+        iter_text.assert_called_once_with(offset=offsets[10])
+
+    def test_offsets_are_kept_in_the_index(self):
+        self.processor().reader.chunk_offsets(self.CHUNK_SIZE)
+        reopened = self.processor()
+        with mock.patch.object(reopened.reader, '_scan_chunk_offsets') as scan:
+            reopened.reader.chunk_offsets(self.CHUNK_SIZE)
+        scan.assert_not_called()
+
+    def test_resume_analysis_starts_after_the_checkpoint(self):
+        processor = self.processor()
+        processor.save_checkpoint(14)
+        resumed = self.processor()
+        resumed.resume_analysis()
+        self.assertEqual(resumed.analyzer.analyzed, list(range(15, len(list(processor.read_novel())))))
+
+
+@mock.patch.dict(os.environ, {'DEEPSEEK_API_KEY': 'server-key'})
+class AnalysisEndpointTests(TestCase):
+
+    def setUp(self):
+        # Job control publishes progress events under GAME_DATA_DIR
+        data_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, data_dir, ignore_errors=True)
+        data = override_settings(GAME_DATA_DIR=Path(data_dir))
+        data.enable()
+        self.addCleanup(data.disable)
+
+        self.project = GameProject.objects.create(name='测试小说')
+
+    def post(self, action, body=None):
+        return self.client.post(
+            f'/api/creative/project/{self.project.id}/analyze/{action}/',
+            json.dumps(body or {}), content_type='application/json'
+        )
+
+    def test_client_keys_are_not_used_without_a_server_key(self):
+        with mock.patch.dict(os.environ, {'DEEPSEEK_API_KEY': ''}):
+            for action in ('start', 'continue', 'finalize'):
+                response = self.post(action, {'api_key': 'client-key'})
+                self.assertEqual(response.status_code, 400, action)
+                self.assertIn('DEEPSEEK_API_KEY', response.json()['error'])
+        self.assertFalse(AnalysisJob.objects.exists())
+
+    def test_continue_with_old_payload_queues_after_last_analysed_chunk(self):
+        for index in range(5):
+            AnalysisCache.objects.create(project=self.project, chunk_index=index, chunk_content='', analysis_result={})
+
+        response = self.post('continue', {'api_key': 'client-key', 'api_provider': 'deepseek'})
+        self.assertEqual(response.status_code, 200)
+        job = AnalysisJob.objects.get(project=self.project)
+        self.assertEqual((job.status, job.chunk_index), ('queued', 4))
+        self.assertEqual(response.json()['job']['job_id'], job.id)
+
+    def test_continue_without_earlier_analysis_starts_from_the_beginning(self):
+        self.assertEqual(self.post('continue').status_code, 200)
+        self.assertEqual(AnalysisJob.objects.get(project=self.project).chunk_index, -1)
+
+    def test_continue_resumes_a_paused_job(self):
+        job = AnalysisJob.objects.create(project=self.project, status='paused', chunk_index=7)
+        response = self.post('continue', {'api_key': 'client-key'})
+        self.assertEqual(response.status_code, 200)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.chunk_index), ('queued', 7))
+
+    def test_continue_leaves_a_running_job_alone(self):
+        job = AnalysisJob.objects.create(project=self.project, status='running', worker='w')
+        response = self.post('continue')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['job']['status'], 'running')
+        self.assertEqual(AnalysisJob.objects.count(), 1)
+
+    def test_continue_unknown_project(self):
+        response = self.client.post('/api/creative/project/99999/analyze/continue/', '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 404)
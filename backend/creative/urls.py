@@ -6,8 +6,11 @@ urlpatterns = [
     
     path('project/<int:project_id>/analyze/start/', views.start_analysis, name='start_analysis'),
     path('project/<int:project_id>/analyze/continue/', views.continue_analysis, name='continue_analysis'),
+    path('project/<int:project_id>/analyze/pause/', views.pause_analysis, name='pause_analysis'),
+    path('project/<int:project_id>/analyze/cancel/', views.cancel_analysis, name='cancel_analysis'),
     path('project/<int:project_id>/analyze/finalize/', views.finalize_analysis, name='finalize_analysis'),
     path('project/<int:project_id>/analyze/progress/', views.get_analysis_progress, name='get_analysis_progress'),
+    path('project/<int:project_id>/analyze/stream/', views.stream_analysis_progress, name='stream_analysis_progress'),
     
     path('project/<int:project_id>/session/start/', views.start_creative_session, name='start_creative_session'),
     path('session/<int:session_id>/chat/', views.creative_chat, name='creative_chat'),
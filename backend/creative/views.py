@@ -1,11 +1,20 @@
 import json
-from django.http import JsonResponse
+from django.http import StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from game.models import GameProject, AnalysisCache
+from game.models import GameProject, AnalysisCache, AnalysisJob
+from game.http_cache import invalidate_project
+from game.json_codec import JsonResponse
+from game.projects import fields_for_path, get_project, get_project_status
+from game.story_store import chapter_ids_at_path, save_chapters, sync_story_tree
 from .models import CreativeSession, CustomContent, ModificationLog
 from .ai_agent import CreativeAgent
 from .analysis_service import NovelAnalysisService
+from .chunk_store import ChunkStore
+from .job_events import stream_events
+from .jobs import JobError, active_job, cancel_job, enqueue_analysis, job_progress, latest_job, pause_job, resume_job
+from .llm_client import get_provider_config, get_server_api_key
+from .novel_reader import sniff_encoding
 
 
 @csrf_exempt
@@ -19,7 +28,7 @@ def start_creative_session(request, project_id):
         if not api_key:
             return JsonResponse({'success': False, 'error': '需要提供API Key'}, status=400)
         
-        project = GameProject.objects.get(id=project_id)
+        project = GameProject.objects.only('id').get(id=project_id)
         
         session = CreativeSession.objects.create(
             project=project,
@@ -49,7 +58,7 @@ def creative_chat(request, session_id):
             return JsonResponse({'success': False, 'error': '消息不能为空'}, status=400)
         
         session = CreativeSession.objects.get(id=session_id)
-        project = session.project
+        project = get_project(session.project_id, 'world_setting', 'characters', 'story_tree', 'attributes', 'items')
         
         game_context = {
             'world_setting': project.world_setting,
@@ -89,7 +98,7 @@ def generate_content(request, session_id):
         requirements = data.get('requirements')
         
         session = CreativeSession.objects.get(id=session_id)
-        project = session.project
+        project = get_project(session.project_id, 'world_setting', 'characters', 'story_tree')
         
         game_context = {
             'world_setting': project.world_setting,
@@ -122,15 +131,15 @@ def apply_modification(request, session_id):
         modification_data = data.get('modification')
         
         session = CreativeSession.objects.get(id=session_id)
-        project = session.project
         
         operation_type = modification_data.get('operation_type')
         target_path = modification_data.get('target_path')
         new_value = modification_data.get('new_value')
         
+        # Only the field being edited is read, and save() writes only that field back
+        project = get_project(session.project_id, *fields_for_path(target_path))
         old_value = get_value_by_path(project, target_path)
-        set_value_by_path(project, target_path, new_value)
-        project.save()
+        save_value_by_path(project, target_path, new_value)
         
         ModificationLog.objects.create(
             project=project,
@@ -227,11 +236,10 @@ def get_modification_history(request, project_id):
 def revert_modification(request, project_id, log_id):
     try:
         log = ModificationLog.objects.get(id=log_id, project_id=project_id)
-        project = log.project
+        project = get_project(project_id, *fields_for_path(log.target_path))
         
         if log.old_value is not None:
-            set_value_by_path(project, log.target_path, log.old_value)
-            project.save()
+            save_value_by_path(project, log.target_path, log.old_value)
         
         ModificationLog.objects.create(
             project=project,
@@ -270,42 +278,69 @@ def upload_novel(request):
             analysis_status='pending'
         )
         
+        # The encoding is sniffed from a sample and the file transcoded to UTF-8 once here,
+        # so analysis requests only read the chunk they need
+        novel_path = project.novel_file.path
+        try:
+            encoding = sniff_encoding(novel_path)
+            ChunkStore.build(novel_path, encoding).reader().build_index()
+        except ValueError as e:
+            ChunkStore.remove_sidecars(novel_path)
+            project.novel_file.delete(save=False)
+            project.delete()
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        
+        project.novel_encoding = encoding
+        project.save(update_fields=['novel_encoding'])
+        
         return JsonResponse({
             'success': True,
             'project_id': project.id,
+            'encoding': encoding,
             'message': '小说上传成功，等待分析'
         })
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+def _missing_server_key(api_provider):
+    # Every analysis endpoint calls the API with the server's key; an api_key sent by the client is ignored
+    if get_server_api_key(api_provider):
+        return None
+    env_name = get_provider_config(api_provider)['api_key_env']
+    return JsonResponse({'success': False, 'error': f'服务器未配置 {env_name}，无法进行小说分析'}, status=400)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def start_analysis(request, project_id):
     try:
         data = json.loads(request.body)
-        api_key = data.get('api_key')
         api_provider = data.get('api_provider', 'deepseek')
         
-        if not api_key:
-            return JsonResponse({'success': False, 'error': '需要提供API Key'}, status=400)
+        missing_key = _missing_server_key(api_provider)
+        if missing_key:
+            return missing_key
         
-        project = GameProject.objects.get(id=project_id)
+        project = GameProject.objects.only('id').get(id=project_id)
         
-        service = NovelAnalysisService(project, api_key, api_provider)
-        
-        project.analysis_status = 'analyzing'
-        project.save()
-        
-        result = service.analyze_next_chunk()
+        # The analysis runs in `manage.py run_analysis_worker`, not in this request
+        job = enqueue_analysis(
+            project,
+            api_provider,
+            chapter_mode=bool(data.get('chapter_mode', False)),
+            concurrency=int(data.get('concurrency', 1))
+        )
         
         return JsonResponse({
             'success': True,
-            'message': '分析任务已启动',
-            'result': result
-        })
+            'message': '分析任务已加入队列',
+            'job': job_progress(job)
+        }, status=202)
     except GameProject.DoesNotExist:
         return JsonResponse({'success': False, 'error': '项目不存在'}, status=404)
+    except JobError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=409)
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
@@ -314,57 +349,131 @@ def start_analysis(request, project_id):
 @require_http_methods(["GET"])
 def get_analysis_progress(request, project_id):
     try:
-        project = GameProject.objects.get(id=project_id)
+        project = get_project_status(project_id)
+        job = latest_job(project_id)
         
         return JsonResponse({
             'success': True,
             'data': {
                 'status': project.analysis_status,
                 'progress': project.analysis_progress,
+                'job': job_progress(job) if job else None,
             }
         })
     except GameProject.DoesNotExist:
         return JsonResponse({'success': False, 'error': '项目不存在'}, status=404)
 
 
+@csrf_exempt
+@require_http_methods(["GET"])
+def stream_analysis_progress(request, project_id):
+    """
+    Server-sent events for the project's latest analysis job: `progress`
+    (chunk index, throughput, ETA, latest 片段摘要) and `status` events.
+    """
+    job = AnalysisJob.objects.filter(project_id=project_id).only('id', 'status').first()
+    if job is None:
+        return JsonResponse({'success': False, 'error': '没有分析任务'}, status=404)
+    
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id') or 0)
+    except ValueError:
+        last_event_id = 0
+    
+    response = StreamingHttpResponse(
+        stream_events(job.id, last_event_id, job.status),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _control_analysis(project_id, action):
+    job = active_job(project_id)
+    if job is None:
+        return JsonResponse({'success': False, 'error': '没有进行中的分析任务'}, status=404)
+    
+    try:
+        action(job)
+    except JobError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=409)
+    
+    job.refresh_from_db()
+    return JsonResponse({'success': True, 'job': job_progress(job)})
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def continue_analysis(request, project_id):
+    """
+    Resume a paused job, or queue one that carries on after the last
+    analysed chunk. The old {api_key, api_provider} body is still accepted
+    (api_key is ignored). Returns at once with the job; progress comes from
+    analyze/progress/ or analyze/stream/ instead of a per-chunk result.
+    """
     try:
-        data = json.loads(request.body)
-        api_key = data.get('api_key')
-        api_provider = data.get('api_provider', 'deepseek')
-        
-        project = GameProject.objects.get(id=project_id)
-        
-        service = NovelAnalysisService(project, api_key, api_provider)
-        result = service.analyze_next_chunk()
-        
-        return JsonResponse({
-            'success': True,
-            'result': result
-        })
+        data = json.loads(request.body or '{}')
+        project = GameProject.objects.only('id').get(id=project_id)
+        job = active_job(project_id)
+        
+        missing_key = _missing_server_key(job.api_provider if job else data.get('api_provider', 'deepseek'))
+        if missing_key:
+            return missing_key
+        
+        # A queued or running job is already continuing
+        if job is None:
+            job = enqueue_analysis(
+                project,
+                data.get('api_provider', 'deepseek'),
+                chapter_mode=bool(data.get('chapter_mode', False)),
+                concurrency=int(data.get('concurrency', 1)),
+                resume=True
+            )
+        elif job.status == 'paused':
+            resume_job(job)
+            job.refresh_from_db()
+        
+        return JsonResponse({'success': True, 'job': job_progress(job)})
     except GameProject.DoesNotExist:
         return JsonResponse({'success': False, 'error': '项目不存在'}, status=404)
+    except JobError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=409)
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def pause_analysis(request, project_id):
+    return _control_analysis(project_id, pause_job)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def cancel_analysis(request, project_id):
+    return _control_analysis(project_id, cancel_job)
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def finalize_analysis(request, project_id):
     try:
-        data = json.loads(request.body)
-        api_key = data.get('api_key')
+        data = json.loads(request.body or '{}')
         api_provider = data.get('api_provider', 'deepseek')
         
-        project = GameProject.objects.get(id=project_id)
+        missing_key = _missing_server_key(api_provider)
+        if missing_key:
+            return missing_key
         
-        service = NovelAnalysisService(project, api_key, api_provider)
+        # The design fields finalize_design overwrites without reading stay deferred
+        project = get_project(project_id, 'world_setting', 'characters', 'items')
+        
+        service = NovelAnalysisService(project, get_server_api_key(api_provider), api_provider)
         result = service.finalize_design()
         
         project.analysis_status = 'completed'
-        project.save()
+        project.save(update_fields=['analysis_status', 'updated_at'])
         
         return JsonResponse({
             'success': True,
@@ -393,6 +502,20 @@ def get_value_by_path(project, path):
     return obj
 
 
+def save_value_by_path(project, path, value):
+    # An edit inside one story chapter re-mirrors that chapter only, not the whole book
+    touched = chapter_ids_at_path(project.story_tree, path) if path.startswith('story_tree') else None
+    set_value_by_path(project, path, value)
+    
+    if touched is not None:
+        save_chapters(project, touched | chapter_ids_at_path(project.story_tree, path))
+    else:
+        project.save()
+        if path.startswith('story_tree'):
+            sync_story_tree(project)
+    invalidate_project(project.id)
+
+
 def set_value_by_path(project, path, value):
     parts = path.split('.')
     field_name = parts[0]
@@ -0,0 +1,237 @@
+import json
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from .story_analysis import CONTEXT_KEYS
+
+
+MAX_CACHED_SCENES = 1024
+CHAPTER_NUMBER_PATTERN = re.compile(r'(\d+)$')
+
+
+class PlayerState:
+    """
+    Player state prepared once per request: inventory and flags as sets for
+    O(1) membership. `chapter_order` is a {chapter_id: position} dict, or a
+    callable returning one, used by `chapter` conditions.
+    """
+
+    __slots__ = (
+        'attributes', 'inventory', 'flags', 'relationships', 'completed_quests', 'current_chapter', '_chapter_order'
+    )
+
+    def __init__(self, player_state, chapter_order=None):
+        self.attributes = player_state.get('attributes') or {}
+        self.relationships = player_state.get('relationships') or {}
+        self.inventory = {
+            item.get('item_id') if isinstance(item, dict) else item
+            for item in player_state.get('inventory') or []
+        }
+        self.flags = set(player_state.get('flags') or [])
+        self.completed_quests = set(player_state.get('completed_quests') or [])
+        self.current_chapter = player_state.get('current_chapter') or ''
+        self._chapter_order = chapter_order
+
+    def chapter_position(self, chapter):
+        if callable(self._chapter_order):
+            self._chapter_order = self._chapter_order()
+        if self._chapter_order and chapter in self._chapter_order:
+            return self._chapter_order[chapter]
+        # Without the project's order, 'chapter_1000' still has to come after 'chapter_999'
+        if isinstance(chapter, int):
+            return chapter
+        match = CHAPTER_NUMBER_PATTERN.search(str(chapter))
+        return int(match.group(1)) if match else None
+
+
+def _at_least_attribute(name, value):
+    return lambda state: state.attributes.get(name, 0) >= value
+
+
+def _at_least_relationship(name, value):
+    return lambda state: state.relationships.get(name, 0) >= value
+
+
+def _stat(state, name):
+    # Story data writes relationships flat, e.g. {"relationship_xuner": 30}
+    return state.attributes.get(name, state.relationships.get(name, 0))
+
+
+def _at_least_stat(name, value):
+    return lambda state: _stat(state, name) >= value
+
+
+def _range_bounds(value):
+    # [min, max] or {"min": .., "max": ..}; a missing bound is open
+    if isinstance(value, dict):
+        return value.get('min'), value.get('max')
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        return value[0], value[1]
+    return None
+
+
+def _within(position, low, high):
+    return position is not None and (low is None or position >= low) and (high is None or position <= high)
+
+
+def _stat_in_range(name, low, high):
+    return lambda state: _within(_stat(state, name), low, high)
+
+
+def _chapter_in_range(low, high):
+    def check(state):
+        bounds = [None if chapter is None else state.chapter_position(chapter) for chapter in (low, high)]
+        # A bound naming an unknown chapter matches nothing
+        if any(chapter is not None and position is None for chapter, position in zip((low, high), bounds)):
+            return False
+        return _within(state.chapter_position(state.current_chapter), *bounds)
+    return check
+
+
+def _has_items(items):
+    items = frozenset(items)
+    return lambda state: items <= state.inventory
+
+
+def _has_flags(flags):
+    flags = frozenset(flags)
+    return lambda state: flags <= state.flags
+
+
+def _completed_quests(quests):
+    quests = frozenset(quests)
+    return lambda state: quests <= state.completed_quests
+
+
+def _as_list(value):
+    return value if isinstance(value, (list, tuple)) else [value]
+
+
+def _flag_is(name, value):
+    return lambda state: (name in state.flags) == value
+
+
+def _reached_chapter(chapter):
+    def check(state):
+        current = state.chapter_position(state.current_chapter)
+        target = state.chapter_position(chapter)
+        return current is not None and target is not None and current >= target
+    return check
+
+
+def _compile_checks(condition, flat):
+    checks = []
+
+    for attr, value in (condition.get('needs_attribute') or {}).items():
+        checks.append(_at_least_attribute(attr, value))
+    if condition.get('needs_item'):
+        checks.append(_has_items(condition['needs_item']))
+    if condition.get('needs_flag'):
+        checks.append(_has_flags(condition['needs_flag']))
+    for char, value in (condition.get('needs_relationship') or {}).items():
+        checks.append(_at_least_relationship(char, value))
+
+    if not flat:
+        return tuple(checks)
+
+    for key, value in condition.items():
+        # Context keys (time, weather, dice...) are the client's to check
+        if key.startswith('needs_') or key in CONTEXT_KEYS:
+            continue
+        if key == 'item':
+            checks.append(_has_items(_as_list(value)))
+        elif key == 'flag':
+            checks.append(_has_flags(_as_list(value)))
+        elif key == 'quest_completed':
+            checks.append(_completed_quests(_as_list(value)))
+        elif key == 'chapter':
+            checks.append(_reached_chapter(value))
+        elif key.endswith('_range'):
+            bounds = _range_bounds(value)
+            if bounds is None:
+                raise ValueError(f'条件 {key} 应为 [最小值, 最大值]')
+            if key == 'chapter_range':
+                checks.append(_chapter_in_range(*bounds))
+            else:
+                checks.append(_stat_in_range(key[:-len('_range')], *bounds))
+        elif isinstance(value, bool):
+            checks.append(_flag_is(key, value))
+        elif isinstance(value, (int, float)):
+            checks.append(_at_least_stat(key, value))
+
+    return tuple(checks)
+
+
+@lru_cache(maxsize=4096)
+def _compile_cached(condition_key, flat):
+    checks = _compile_checks(json.loads(condition_key), flat)
+
+    def evaluate(state):
+        for check in checks:
+            if not check(state):
+                return False
+        return True
+
+    return evaluate
+
+
+def compile_condition(condition, flat=True):
+    """
+    With flat=False only the needs_* keys are checked, exactly as the
+    original check-condition endpoint did. flat=True also understands the
+    story data's flat form: {"intelligence": 65}, item and flag (one id or a
+    list), quest_completed, chapter, chapter_range and <stat>_range
+    ([min, max]) and boolean flags. CONTEXT_KEYS are left to the client.
+    """
+    if not condition:
+        return lambda state: True
+    return _compile_cached(json.dumps(condition, sort_keys=True, ensure_ascii=False), flat)
+
+
+def evaluate_condition(condition, player_state):
+    return compile_condition(condition, flat=False)(PlayerState(player_state))
+
+
+_scene_conditions = OrderedDict()
+_scene_conditions_lock = threading.Lock()
+
+
+def _collect_scene_conditions(scene):
+    conditions = []
+
+    for key in ('unlock_condition', 'condition'):
+        if scene.get(key):
+            conditions.append((scene.get('scene_id', ''), scene[key]))
+
+    for node in (scene.get('content') or {}).get('nodes', []):
+        node_id = node.get('node_id', '')
+        for key in ('unlock_condition', 'condition'):
+            if node.get(key):
+                conditions.append((node_id, node[key]))
+        for index, choice in enumerate(node.get('choices') or node.get('options') or []):
+            choice_id = choice.get('id') or choice.get('choice_id') or f'{node_id}:{index}'
+            conditions.append((choice_id, choice.get('condition') or choice.get('requirements') or {}))
+
+    return tuple((key, compile_condition(condition)) for key, condition in conditions)
+
+
+def get_scene_conditions(project_id, chapter, scene):
+    """
+    Compiled conditions of one scene, cached per project. The chapter's
+    content hash is part of the key, so an edited chapter recompiles.
+    """
+    key = (project_id, chapter.chapter_id, chapter.content_hash, scene.get('scene_id', ''))
+
+    with _scene_conditions_lock:
+        if key in _scene_conditions:
+            _scene_conditions.move_to_end(key)
+            return _scene_conditions[key]
+
+    compiled = _collect_scene_conditions(scene)
+
+    with _scene_conditions_lock:
+        _scene_conditions[key] = compiled
+        while len(_scene_conditions) > MAX_CACHED_SCENES:
+            _scene_conditions.popitem(last=False)
+    return compiled
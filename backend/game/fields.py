@@ -0,0 +1,170 @@
+import zlib
+from pathlib import Path
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+from . import json_codec
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+DICTIONARY_DIR = Path(__file__).resolve().parent / 'dictionaries'
+MIN_COMPRESS_SIZE = 128
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+# First byte of every stored value
+RAW = b'J'
+ZLIB = b'Z'
+ZSTD = b'S'
+
+
+def _load_dictionaries():
+    # json_v<N>.bin, written by tools/train_json_dictionary.py; ids are never reused
+    dictionaries = {0: b''}
+    for path in DICTIONARY_DIR.glob('json_v*.bin'):
+        dictionaries[int(path.stem[len('json_v'):])] = path.read_bytes()
+    return dictionaries
+
+
+DICTIONARIES = _load_dictionaries()
+CURRENT_DICTIONARY = max(DICTIONARIES)
+
+_zstd_dictionaries = {}
+
+
+def _zstd_dictionary(dictionary_id):
+    if dictionary_id not in _zstd_dictionaries:
+        _zstd_dictionaries[dictionary_id] = zstandard.ZstdCompressionDict(
+            DICTIONARIES[dictionary_id], dict_type=zstandard.DICT_TYPE_RAWCONTENT
+        ) if dictionary_id else None
+    return _zstd_dictionaries[dictionary_id]
+
+
+def compress(data):
+    """Frame `data` (bytes) as RAW, or zstd / zlib against the current dictionary."""
+    if len(data) < MIN_COMPRESS_SIZE:
+        return RAW + data
+    dictionary_id = CURRENT_DICTIONARY
+    if zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=_zstd_dictionary(dictionary_id))
+        return ZSTD + bytes([dictionary_id]) + compressor.compress(data)
+    compressor = zlib.compressobj(ZLIB_LEVEL, zdict=DICTIONARIES[dictionary_id]) if dictionary_id else zlib.compressobj(ZLIB_LEVEL)
+    return ZLIB + bytes([dictionary_id]) + compressor.compress(data) + compressor.flush()
+
+
+def decompress(blob):
+    blob = bytes(blob)
+    kind = blob[:1]
+    if kind == RAW:
+        return blob[1:]
+    if kind == ZLIB:
+        dictionary_id = blob[1]
+        decompressor = zlib.decompressobj(zdict=DICTIONARIES[dictionary_id]) if dictionary_id else zlib.decompressobj()
+        return decompressor.decompress(blob[2:]) + decompressor.flush()
+    if kind == ZSTD:
+        if zstandard is None:
+            raise ValueError('该数据使用 zstd 压缩，请安装 zstandard')
+        dictionary = _zstd_dictionary(blob[1])
+        return zstandard.ZstdDecompressor(dict_data=dictionary).decompressobj().decompress(blob[2:])
+    raise ValueError('未知的压缩格式')
+
+
+class CompressedValue(bytes):
+    """A stored value as read from the database, decoded on first attribute access."""
+
+
+class CompressedAttribute(DeferredAttribute):
+    # A data descriptor, so reads go through __get__ even once the value is in __dict__
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedValue):
+            value = self.field.decode(value)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+
+class CompressedFieldMixin:
+    """
+    Stores the value compressed in a BLOB column. Rows read into model
+    instances keep the compressed bytes until the attribute is first read,
+    and an untouched value is written back without recompressing.
+    values() / values_list() yield the CompressedValue; read through model
+    instances (only()/defer()) instead. Rows written before the column was
+    compressed (plain JSON text) are still read.
+
+    Subclasses define to_bytes(value) and from_bytes(data);
+    the mixin adds the compression framing around them.
+    """
+
+    descriptor_class = CompressedAttribute
+
+    def get_internal_type(self):
+        return 'BinaryField'
+
+    def encode(self, value):
+        return compress(self.to_bytes(value))
+
+    def decode(self, blob):
+        return self.from_bytes(decompress(blob))
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        if isinstance(value, str):
+            return self.decode_legacy(value)
+        return CompressedValue(value)
+
+    def decode_legacy(self, text):
+        return text
+
+    def get_prep_value(self, value):
+        if value is None:
+            return value
+        if isinstance(value, CompressedValue):
+            return bytes(value)
+        return self.encode(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        return connection.Database.Binary(value) if value is not None else None
+
+    def to_python(self, value):
+        if isinstance(value, CompressedValue):
+            return self.decode(value)
+        return value
+
+    def value_to_string(self, obj):
+        return self.to_bytes(self.value_from_object(obj)).decode('utf-8')
+
+
+class CompressedJSONField(CompressedFieldMixin, models.Field):
+    def to_bytes(self, value):
+        return json_codec.dumps(value)
+
+    def from_bytes(self, data):
+        return json_codec.loads(data)
+
+    def decode_legacy(self, text):
+        return json_codec.loads(text)
+
+    def to_python(self, value):
+        if isinstance(value, str):
+            return json_codec.loads(value)
+        return super().to_python(value)
+
+
+class CompressedTextField(CompressedFieldMixin, models.Field):
+    def to_bytes(self, value):
+        return str(value).encode('utf-8')
+
+    def from_bytes(self, data):
+        return data.decode('utf-8')
@@ -0,0 +1,76 @@
+import hashlib
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+from .models import GameProject
+
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _generation_key(project_id):
+    return f'game:generation:{project_id}'
+
+
+def invalidate_project(project_id):
+    # Bumping the generation orphans every rendered response of the project at once
+    key = _generation_key(project_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in tags
+
+
+def cached_project_response(view):
+    """
+    Serve a read-only project view from a rendered-bytes cache, with a strong
+    ETag, Last-Modified and 304 handling. Entries are keyed on the project's
+    updated_at and an invalidation generation, so any project save or an
+    explicit invalidate_project() makes the next request re-render.
+    """
+
+    @wraps(view)
+    def wrapper(request, project_id, *args, **kwargs):
+        updated_at = GameProject.objects.filter(id=project_id).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return view(request, project_id, *args, **kwargs)
+
+        generation = cache.get(_generation_key(project_id), 0)
+        arguments = ':'.join(f'{k}={v}' for k, v in sorted(kwargs.items()))
+        arguments += '?' + request.GET.urlencode()
+        key = f'game:response:{view.__name__}:{project_id}:{generation}:{updated_at.timestamp()}:{arguments}'
+
+        entry = cache.get(key)
+        if entry is None:
+            response = view(request, project_id, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            body = response.content
+            entry = ('"%s"' % hashlib.sha256(body).hexdigest(), response['Content-Type'], body)
+            cache.set(key, entry, CACHE_TIMEOUT)
+
+        etag, content_type, body = entry
+        last_modified = int(updated_at.timestamp())
+
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            not_modified = _etag_matches(request.META['HTTP_IF_NONE_MATCH'], etag)
+        else:
+            since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+            not_modified = since is not None and last_modified <= since
+
+        response = HttpResponseNotModified() if not_modified else HttpResponse(body, content_type=content_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = f'public, max-age={settings.GAME_CACHE_MAX_AGE}, must-revalidate'
+        return response
+
+    return wrapper
@@ -0,0 +1,111 @@
+import json
+import threading
+from collections import OrderedDict
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Total serialized bytes kept by cached_fragment, least recently used evicted first
+MAX_CACHED_FRAGMENT_BYTES = 64 * 1024 * 1024
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+_django_encoder = DjangoJSONEncoder()
+
+
+class Fragment:
+    """Already-serialized JSON, embedded verbatim by dumps()."""
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+
+def _stdlib_dumps(value, default, indent):
+    return json.dumps(
+        value, default=default, ensure_ascii=False, indent=2 if indent else None,
+        separators=None if indent else (',', ':')
+    ).encode('utf-8')
+
+
+def dumps(value, indent=False):
+    """
+    Serialize to UTF-8 JSON bytes with orjson when installed, else the
+    stdlib. Dates, decimals and UUIDs are written the way Django's
+    JsonResponse writes them; Fragment values are spliced in as-is.
+    """
+    fragments = []
+
+    def default(obj):
+        if isinstance(obj, Fragment):
+            fragments.append(obj.data)
+            return f'\x00fragment:{len(fragments) - 1}\x00'
+        return _django_encoder.default(obj)
+
+    data = None
+    if orjson is not None:
+        try:
+            data = orjson.dumps(value, default=default, option=ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+        except TypeError:
+            # Integers beyond 64 bits and the like: let the stdlib have a go
+            fragments.clear()
+    if data is None:
+        data = _stdlib_dumps(value, default, indent)
+
+    for index, fragment in enumerate(fragments):
+        data = data.replace(f'"\\u0000fragment:{index}\\u0000"'.encode('utf-8'), fragment, 1)
+    return data
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+_fragments = OrderedDict()
+_fragments_lock = threading.Lock()
+_fragment_bytes = 0
+
+
+def cached_fragment(key, build):
+    """
+    Serialized bytes for immutable content, e.g. a chapter story under its
+    content hash. `build` is only called (and the value only decoded) on a miss.
+    Keys must be content-addressed: an edited value gets a new key and the
+    old entry ages out of the byte budget.
+    """
+    global _fragment_bytes
+
+    with _fragments_lock:
+        if key in _fragments:
+            _fragments.move_to_end(key)
+            return _fragments[key]
+
+    fragment = Fragment(dumps(build()))
+    if len(fragment.data) > MAX_CACHED_FRAGMENT_BYTES:
+        return fragment
+
+    with _fragments_lock:
+        if key not in _fragments:
+            _fragments[key] = fragment
+            _fragment_bytes += len(fragment.data)
+        while _fragment_bytes > MAX_CACHED_FRAGMENT_BYTES:
+            _, evicted = _fragments.popitem(last=False)
+            _fragment_bytes -= len(evicted.data)
+    return fragment
+
+
+class JsonResponse(HttpResponse):
+    """Drop-in for django.http.JsonResponse, serialized through dumps()."""
+
+    def __init__(self, data, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
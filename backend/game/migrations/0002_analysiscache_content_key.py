@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysiscache',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='片段内容哈希'),
+        ),
+        migrations.AddField(
+            model_name='analysiscache',
+            name='model_name',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='模型名称'),
+        ),
+        migrations.AddField(
+            model_name='analysiscache',
+            name='prompt_version',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='提示词版本'),
+        ),
+        migrations.AddIndex(
+            model_name='analysiscache',
+            index=models.Index(fields=['content_hash', 'prompt_version', 'model_name'], name='game_analys_content_4a04b0_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0002_analysiscache_content_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_index', models.IntegerField(verbose_name='最后处理的片段')),
+                ('chapter_mode', models.BooleanField(default=False, verbose_name='按章节分割')),
+                ('state', models.JSONField(default=dict, verbose_name='处理器状态')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_checkpoints', to='game.gameproject')),
+            ],
+            options={
+                'verbose_name': '分析检查点',
+                'verbose_name_plural': '分析检查点',
+                'ordering': ['-chunk_index'],
+                'unique_together': {('project', 'chapter_mode', 'chunk_index')},
+            },
+        ),
+    ]
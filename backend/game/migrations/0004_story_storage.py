@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0003_analysischeckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoryNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node_id', models.CharField(max_length=100)),
+                ('scene_id', models.CharField(blank=True, max_length=100)),
+                ('scene_index', models.IntegerField(default=0)),
+                ('node_index', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': '剧情节点',
+                'verbose_name_plural': '剧情节点',
+            },
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='剧情内容哈希'),
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='story',
+            field=models.JSONField(default=dict, verbose_name='章节剧情图'),
+        ),
+        migrations.AddIndex(
+            model_name='chapter',
+            index=models.Index(fields=['project', 'chapter_id'], name='game_chapte_project_878d76_idx'),
+        ),
+        migrations.AddField(
+            model_name='storynode',
+            name='chapter',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='story_nodes', to='game.chapter'),
+        ),
+        migrations.AddField(
+            model_name='storynode',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='story_nodes', to='game.gameproject'),
+        ),
+        migrations.AddIndex(
+            model_name='storynode',
+            index=models.Index(fields=['project', 'node_id'], name='game_storyn_project_50dcb2_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='storynode',
+            unique_together={('chapter', 'node_id')},
+        ),
+    ]
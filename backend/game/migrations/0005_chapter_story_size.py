@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:25
+
+import json
+
+from django.db import migrations, models
+
+
+def fill_story_size(apps, schema_editor):
+    Chapter = apps.get_model('game', 'Chapter')
+    for chapter in Chapter.objects.exclude(content_hash='').only('id', 'story'):
+        payload = json.dumps(chapter.story, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        Chapter.objects.filter(id=chapter.id).update(story_size=len(payload))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0004_story_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='story_size',
+            field=models.IntegerField(default=0, verbose_name='剧情数据大小'),
+        ),
+        migrations.RunPython(fill_story_size, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0005_chapter_story_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesave',
+            name='snapshot_version',
+            field=models.IntegerField(default=0, verbose_name='快照版本'),
+        ),
+        migrations.AddField(
+            model_name='gamesave',
+            name='version',
+            field=models.IntegerField(default=0, verbose_name='存档版本'),
+        ),
+        migrations.CreateModel(
+            name='SaveDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.IntegerField(verbose_name='存档版本')),
+                ('patch', models.JSONField(default=list, verbose_name='增量补丁')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('game_save', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deltas', to='game.gamesave')),
+            ],
+            options={
+                'verbose_name': '存档增量',
+                'verbose_name_plural': '存档增量',
+                'ordering': ['version'],
+                'unique_together': {('game_save', 'version')},
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:39
+
+import game.fields
+from django.db import migrations
+from game.fields import CompressedValue
+
+
+COMPRESSED_FIELDS = {
+    'AnalysisCache': ['analysis_result', 'chunk_content'],
+    'Chapter': ['story'],
+    'GameProject': ['story_tree'],
+    'GameSave': ['exploration_data', 'player_attributes', 'player_flags', 'player_inventory', 'relationship_data'],
+}
+
+
+def compress_existing(apps, schema_editor):
+    # Copied rows still hold plain JSON text; rewrite them compressed
+    for model_name, fields in COMPRESSED_FIELDS.items():
+        model = apps.get_model('game', model_name)
+        for instance in model.objects.only('id', *fields).iterator(chunk_size=200):
+            legacy = {
+                field: getattr(instance, field) for field in fields
+                if not isinstance(instance.__dict__.get(field), CompressedValue)
+            }
+            if legacy:
+                model.objects.filter(id=instance.id).update(**legacy)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0006_save_deltas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analysiscache',
+            name='analysis_result',
+            field=game.fields.CompressedJSONField(default=dict),
+        ),
+        migrations.AlterField(
+            model_name='analysiscache',
+            name='chunk_content',
+            field=game.fields.CompressedTextField(),
+        ),
+        migrations.AlterField(
+            model_name='chapter',
+            name='story',
+            field=game.fields.CompressedJSONField(default=dict, verbose_name='章节剧情图'),
+        ),
+        migrations.AlterField(
+            model_name='gameproject',
+            name='story_tree',
+            field=game.fields.CompressedJSONField(default=dict, verbose_name='剧情树'),
+        ),
+        migrations.AlterField(
+            model_name='gamesave',
+            name='exploration_data',
+            field=game.fields.CompressedJSONField(default=dict),
+        ),
+        migrations.AlterField(
+            model_name='gamesave',
+            name='player_attributes',
+            field=game.fields.CompressedJSONField(default=dict),
+        ),
+        migrations.AlterField(
+            model_name='gamesave',
+            name='player_flags',
+            field=game.fields.CompressedJSONField(default=list),
+        ),
+        migrations.AlterField(
+            model_name='gamesave',
+            name='player_inventory',
+            field=game.fields.CompressedJSONField(default=list),
+        ),
+        migrations.AlterField(
+            model_name='gamesave',
+            name='relationship_data',
+            field=game.fields.CompressedJSONField(default=dict),
+        ),
+        migrations.RunPython(compress_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0007_compressed_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(default='queued', max_length=20, verbose_name='任务状态')),
+                ('control', models.CharField(blank=True, default='', max_length=20, verbose_name='控制指令')),
+                ('api_key', models.CharField(max_length=500, verbose_name='API Key')),
+                ('api_provider', models.CharField(default='deepseek', max_length=50, verbose_name='API提供商')),
+                ('chapter_mode', models.BooleanField(default=False, verbose_name='按章节分割')),
+                ('concurrency', models.IntegerField(default=1, verbose_name='并发请求数')),
+                ('chunk_index', models.IntegerField(default=-1, verbose_name='最后完成的片段')),
+                ('total_chunks', models.IntegerField(default=0, verbose_name='片段总数')),
+                ('chunks_done', models.IntegerField(default=0, verbose_name='本轮完成片段数')),
+                ('worker', models.CharField(blank=True, default='', max_length=100, verbose_name='执行进程')),
+                ('error', models.TextField(blank=True, default='', verbose_name='错误信息')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_jobs', to='game.gameproject')),
+            ],
+            options={
+                'verbose_name': '分析任务',
+                'verbose_name_plural': '分析任务',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='game_analys_status_f663fe_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0008_analysis_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameproject',
+            name='novel_encoding',
+            field=models.CharField(blank=True, default='', max_length=20, verbose_name='小说原始编码'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:57
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0009_novel_encoding'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='analysisjob',
+            name='api_key',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:01
+
+from django.db import migrations, models
+
+
+def mark_unparsed(apps, schema_editor):
+    AnalysisCache = apps.get_model('game', 'AnalysisCache')
+    unparsed = [
+        cached.id for cached in AnalysisCache.objects.only('id', 'analysis_result').iterator(chunk_size=200)
+        if isinstance(cached.analysis_result, dict) and 'raw_response' in cached.analysis_result
+    ]
+    AnalysisCache.objects.filter(id__in=unparsed).update(parsed=False)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0010_remove_analysisjob_api_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysiscache',
+            name='parsed',
+            field=models.BooleanField(default=True, verbose_name='结果已解析'),
+        ),
+        migrations.RunPython(mark_unparsed, migrations.RunPython.noop),
+    ]
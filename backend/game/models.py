@@ -1,18 +1,37 @@
 from django.db import models
 from django.contrib.auth.models import User
+from .fields import CompressedJSONField, CompressedTextField
 import json
 
 
+# The large JSON columns of GameProject; status and listing queries leave them unread
+PROJECT_DESIGN_FIELDS = ('world_setting', 'characters', 'story_tree', 'attributes', 'items', 'exploration')
+PROJECT_SUMMARY_FIELDS = ('id', 'name', 'description', 'analysis_status', 'analysis_progress', 'created_at')
+
+
+class GameProjectQuerySet(models.QuerySet):
+    def summary(self):
+        return self.only(*PROJECT_SUMMARY_FIELDS)
+    
+    def status(self):
+        return self.only('id', 'analysis_status', 'analysis_progress', 'updated_at')
+    
+    def with_fields(self, *fields):
+        """All plain columns plus the named design fields; other design fields load on first access."""
+        return self.defer(*(name for name in PROJECT_DESIGN_FIELDS if name not in fields))
+
+
 class GameProject(models.Model):
     name = models.CharField(max_length=200, verbose_name='游戏名称')
     description = models.TextField(blank=True, verbose_name='游戏描述')
     novel_file = models.FileField(upload_to='novels/', verbose_name='小说文件')
+    novel_encoding = models.CharField(max_length=20, blank=True, default='', verbose_name='小说原始编码')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     world_setting = models.JSONField(default=dict, verbose_name='世界观设定')
     characters = models.JSONField(default=dict, verbose_name='角色数据')
-    story_tree = models.JSONField(default=dict, verbose_name='剧情树')
+    story_tree = CompressedJSONField(default=dict, verbose_name='剧情树')
     attributes = models.JSONField(default=dict, verbose_name='属性系统')
     items = models.JSONField(default=dict, verbose_name='物品系统')
     exploration = models.JSONField(default=dict, verbose_name='探索系统')
@@ -20,6 +39,8 @@ class GameProject(models.Model):
     analysis_progress = models.IntegerField(default=0, verbose_name='分析进度')
     analysis_status = models.CharField(max_length=50, default='pending', verbose_name='分析状态')
     
+    objects = GameProjectQuerySet.as_manager()
+    
     class Meta:
         verbose_name = '游戏项目'
         verbose_name_plural = verbose_name
@@ -35,10 +56,34 @@ class Chapter(models.Model):
     order = models.IntegerField(default=0)
     content = models.JSONField(default=dict)
     
+    story = CompressedJSONField(default=dict, verbose_name='章节剧情图')
+    story_size = models.IntegerField(default=0, verbose_name='剧情数据大小')
+    content_hash = models.CharField(max_length=64, blank=True, default='', verbose_name='剧情内容哈希')
+    
     class Meta:
         ordering = ['order']
         verbose_name = '章节'
         verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=['project', 'chapter_id']),
+        ]
+
+
+class StoryNode(models.Model):
+    project = models.ForeignKey(GameProject, on_delete=models.CASCADE, related_name='story_nodes')
+    chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='story_nodes')
+    node_id = models.CharField(max_length=100)
+    scene_id = models.CharField(max_length=100, blank=True)
+    scene_index = models.IntegerField(default=0)
+    node_index = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = '剧情节点'
+        verbose_name_plural = verbose_name
+        unique_together = ['chapter', 'node_id']
+        indexes = [
+            models.Index(fields=['project', 'node_id']),
+        ]
 
 
 class Scene(models.Model):
@@ -88,13 +133,15 @@ class GameSave(models.Model):
     current_scene = models.CharField(max_length=100)
     current_node = models.CharField(max_length=100)
     
-    player_attributes = models.JSONField(default=dict)
-    player_inventory = models.JSONField(default=list)
-    player_flags = models.JSONField(default=list)
-    relationship_data = models.JSONField(default=dict)
-    exploration_data = models.JSONField(default=dict)
+    player_attributes = CompressedJSONField(default=dict)
+    player_inventory = CompressedJSONField(default=list)
+    player_flags = CompressedJSONField(default=list)
+    relationship_data = CompressedJSONField(default=dict)
+    exploration_data = CompressedJSONField(default=dict)
     
     play_time = models.IntegerField(default=0, verbose_name='游戏时间(秒)')
+    version = models.IntegerField(default=0, verbose_name='存档版本')
+    snapshot_version = models.IntegerField(default=0, verbose_name='快照版本')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -104,14 +151,80 @@ class GameSave(models.Model):
         unique_together = ['project', 'user', 'slot']
 
 
+class SaveDelta(models.Model):
+    game_save = models.ForeignKey(GameSave, on_delete=models.CASCADE, related_name='deltas')
+    version = models.IntegerField(verbose_name='存档版本')
+    patch = models.JSONField(default=list, verbose_name='增量补丁')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = '存档增量'
+        verbose_name_plural = verbose_name
+        unique_together = ['game_save', 'version']
+        ordering = ['version']
+
+
 class AnalysisCache(models.Model):
     project = models.ForeignKey(GameProject, on_delete=models.CASCADE, related_name='analysis_cache')
     chunk_index = models.IntegerField()
-    chunk_content = models.TextField()
-    analysis_result = models.JSONField(default=dict)
+    chunk_content = CompressedTextField()
+    analysis_result = CompressedJSONField(default=dict)
+    
+    content_hash = models.CharField(max_length=64, blank=True, default='', verbose_name='片段内容哈希')
+    prompt_version = models.CharField(max_length=64, blank=True, default='', verbose_name='提示词版本')
+    model_name = models.CharField(max_length=100, blank=True, default='', verbose_name='模型名称')
+    # False when analysis_result holds an unparsed raw_response; kept outside the compressed blob so lookups can filter on it
+    parsed = models.BooleanField(default=True, verbose_name='结果已解析')
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         verbose_name = '分析缓存'
         verbose_name_plural = verbose_name
         unique_together = ['project', 'chunk_index']
+        indexes = [
+            models.Index(fields=['content_hash', 'prompt_version', 'model_name']),
+        ]
+
+
+class AnalysisCheckpoint(models.Model):
+    project = models.ForeignKey(GameProject, on_delete=models.CASCADE, related_name='analysis_checkpoints')
+    chunk_index = models.IntegerField(verbose_name='最后处理的片段')
+    chapter_mode = models.BooleanField(default=False, verbose_name='按章节分割')
+    state = models.JSONField(default=dict, verbose_name='处理器状态')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = '分析检查点'
+        verbose_name_plural = verbose_name
+        unique_together = ['project', 'chapter_mode', 'chunk_index']
+        ordering = ['-chunk_index']
+
+
+class AnalysisJob(models.Model):
+    project = models.ForeignKey(GameProject, on_delete=models.CASCADE, related_name='analysis_jobs')
+    status = models.CharField(max_length=20, default='queued', verbose_name='任务状态')
+    control = models.CharField(max_length=20, blank=True, default='', verbose_name='控制指令')
+    
+    api_provider = models.CharField(max_length=50, default='deepseek', verbose_name='API提供商')
+    chapter_mode = models.BooleanField(default=False, verbose_name='按章节分割')
+    concurrency = models.IntegerField(default=1, verbose_name='并发请求数')
+    
+    chunk_index = models.IntegerField(default=-1, verbose_name='最后完成的片段')
+    total_chunks = models.IntegerField(default=0, verbose_name='片段总数')
+    chunks_done = models.IntegerField(default=0, verbose_name='本轮完成片段数')
+    worker = models.CharField(max_length=100, blank=True, default='', verbose_name='执行进程')
+    error = models.TextField(blank=True, default='', verbose_name='错误信息')
+    
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = '分析任务'
+        verbose_name_plural = verbose_name
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
@@ -0,0 +1,30 @@
+from .models import GameProject, PROJECT_DESIGN_FIELDS, PROJECT_SUMMARY_FIELDS
+
+
+def get_project(project_id, *fields):
+    """
+    The project with its plain columns and only the named design fields
+    loaded; any other design field is fetched on first access. save() on the
+    result writes just the loaded fields. Raises GameProject.DoesNotExist.
+    """
+    return GameProject.objects.with_fields(*fields).get(id=project_id)
+
+
+def get_project_status(project_id):
+    return GameProject.objects.status().get(id=project_id)
+
+
+def list_project_summaries():
+    return GameProject.objects.values(*PROJECT_SUMMARY_FIELDS)
+
+
+def load_field(project_id, field):
+    """One design field of a project, or None if the project does not exist."""
+    project = GameProject.objects.only('id', field).filter(id=project_id).first()
+    return getattr(project, field) if project else None
+
+
+def fields_for_path(path):
+    # 'story_tree.chapters.0' -> ('story_tree',); a path outside the design fields needs none
+    field = path.split('.')[0]
+    return (field,) if field in PROJECT_DESIGN_FIELDS else ()
@@ -0,0 +1,213 @@
+import copy
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import GameSave, SaveDelta
+
+
+SNAPSHOT_INTERVAL = 20
+
+# State document key -> GameSave column. Blob fields go into deltas, row fields are written in place.
+BLOB_FIELDS = {
+    'attributes': 'player_attributes',
+    'inventory': 'player_inventory',
+    'flags': 'player_flags',
+    'relationships': 'relationship_data',
+    'exploration': 'exploration_data',
+}
+ROW_FIELDS = {
+    'save_name': 'save_name',
+    'current_chapter': 'current_chapter',
+    'current_scene': 'current_scene',
+    'current_node': 'current_node',
+    'play_time': 'play_time',
+}
+
+
+class PatchError(ValueError):
+    pass
+
+
+class VersionConflict(Exception):
+    def __init__(self, version):
+        super().__init__(f'存档版本冲突，当前版本为 {version}')
+        self.version = version
+
+
+def _parse_pointer(pointer):
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith('/')):
+        raise PatchError(f'无效路径: {pointer}')
+    return [part.replace('~1', '/').replace('~0', '~') for part in pointer.split('/')[1:]]
+
+
+def _list_index(container, token, allow_end=False):
+    if allow_end and token == '-':
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith('0')):
+        raise PatchError(f'无效数组下标: {token}')
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f'数组下标越界: {token}')
+    return index
+
+
+def _resolve(document, parts):
+    target = document
+    for token in parts:
+        if isinstance(target, dict) and token in target:
+            target = target[token]
+        elif isinstance(target, list):
+            target = target[_list_index(target, token)]
+        else:
+            raise PatchError(f'路径不存在: /{"/".join(parts)}')
+    return target
+
+
+def _add(document, parts, value):
+    if not parts:
+        return value
+    parent = _resolve(document, parts[:-1])
+    if isinstance(parent, dict):
+        parent[parts[-1]] = value
+    elif isinstance(parent, list):
+        parent.insert(_list_index(parent, parts[-1], allow_end=True), value)
+    else:
+        raise PatchError(f'无法写入: /{"/".join(parts)}')
+    return document
+
+
+def _remove(document, parts):
+    if not parts:
+        raise PatchError('不能删除整个存档')
+    parent = _resolve(document, parts[:-1])
+    if isinstance(parent, dict) and parts[-1] in parent:
+        return parent.pop(parts[-1])
+    if isinstance(parent, list):
+        return parent.pop(_list_index(parent, parts[-1]))
+    raise PatchError(f'路径不存在: /{"/".join(parts)}')
+
+
+def _top(pointer):
+    parts = _parse_pointer(pointer)
+    return parts[0] if parts else None
+
+
+def apply_patch(document, operations):
+    """Apply JSON-patch (RFC 6902) operations to `document` in place and return it."""
+    if not isinstance(operations, list):
+        raise PatchError('补丁必须是操作列表')
+
+    for operation in operations:
+        op = operation.get('op') if isinstance(operation, dict) else None
+        parts = _parse_pointer(operation.get('path') if op else None)
+
+        if op == 'add':
+            document = _add(document, parts, copy.deepcopy(operation.get('value')))
+        elif op == 'remove':
+            _remove(document, parts)
+        elif op == 'replace':
+            _remove(document, parts)
+            document = _add(document, parts, copy.deepcopy(operation.get('value')))
+        elif op in ('move', 'copy'):
+            source = _parse_pointer(operation.get('from'))
+            value = _remove(document, source) if op == 'move' else copy.deepcopy(_resolve(document, source))
+            document = _add(document, parts, value)
+        elif op == 'test':
+            if _resolve(document, parts) != operation.get('value'):
+                raise PatchError(f'校验失败: {operation.get("path")}')
+        else:
+            raise PatchError(f'不支持的补丁操作: {op}')
+    return document
+
+
+def _row_value(key, value):
+    # Row fields bypass the delta blobs and go straight into their columns, so check them here
+    # rather than let the ORM fail on save; "120" is coerced to 120 for play_time.
+    field = GameSave._meta.get_field(ROW_FIELDS[key])
+    try:
+        if value is None or isinstance(value, (bool, dict, list)):
+            raise ValidationError(value)
+        value = field.to_python(value)
+        field.run_validators(value)
+    except ValidationError:
+        raise PatchError(f'字段 /{key} 的值无效: {value!r}')
+    return value
+
+
+def snapshot_state(save):
+    state = {key: copy.deepcopy(getattr(save, field)) for key, field in BLOB_FIELDS.items()}
+    state.update({key: getattr(save, field) for key, field in ROW_FIELDS.items()})
+    return state
+
+
+def load_state(save):
+    """The save's current state: its last compacted snapshot with the newer deltas replayed."""
+    state = snapshot_state(save)
+    deltas = SaveDelta.objects.filter(
+        game_save=save, version__gt=save.snapshot_version
+    ).values_list('patch', flat=True)
+    for patch in deltas:
+        state = apply_patch(state, patch)
+    return state
+
+
+def write_snapshot(save, state, version):
+    for key, field in {**BLOB_FIELDS, **ROW_FIELDS}.items():
+        if key in state:
+            setattr(save, field, state[key])
+    save.version = version
+    save.snapshot_version = version
+    save.save()
+    SaveDelta.objects.filter(game_save=save, version__lte=version).delete()
+
+
+def save_delta(save, base_version, operations):
+    """
+    Append `operations` as the delta from `base_version` to `base_version + 1`.
+    Row fields are updated in place and only the blob operations are stored,
+    so a save writes bytes in proportion to what changed. Every
+    SNAPSHOT_INTERVAL deltas the state is compacted back into the GameSave row.
+    Returns (version, compacted).
+    """
+    if save.version != base_version:
+        raise VersionConflict(save.version)
+
+    blob_operations = []
+    for operation in operations if isinstance(operations, list) else []:
+        if not isinstance(operation, dict):
+            continue
+        if _top(operation.get('path')) in ROW_FIELDS:
+            # Row fields are written in place, so their deltas must be plain assignments
+            if operation.get('op') not in ('add', 'replace'):
+                raise PatchError(f'字段 {operation.get("path")} 只能整体替换')
+        elif _top(operation.get('path')) in BLOB_FIELDS and (
+                'from' not in operation or _top(operation['from']) in BLOB_FIELDS):
+            blob_operations.append(operation)
+        else:
+            raise PatchError(f'不支持的存档路径: {operation.get("path")}')
+
+    state = apply_patch(load_state(save), operations)
+    if set(state) != set(BLOB_FIELDS) | set(ROW_FIELDS):
+        raise PatchError('补丁不能增删存档的顶层字段')
+    for key in ROW_FIELDS:
+        state[key] = _row_value(key, state[key])
+
+    version = base_version + 1
+    with transaction.atomic():
+        if version - save.snapshot_version >= SNAPSHOT_INTERVAL:
+            # Lock the row so the version check and the snapshot write cannot interleave
+            locked = GameSave.objects.select_for_update().get(pk=save.pk)
+            if locked.version != base_version:
+                raise VersionConflict(locked.version)
+            write_snapshot(locked, state, version)
+            return version, True
+
+        row = {field: state[key] for key, field in ROW_FIELDS.items() if state[key] != getattr(save, field)}
+        updated = GameSave.objects.filter(pk=save.pk, version=base_version).update(
+            version=F('version') + 1, updated_at=timezone.now(), **row
+        )
+        if not updated:
+            raise VersionConflict(GameSave.objects.filter(pk=save.pk).values_list('version', flat=True).first())
+        SaveDelta.objects.create(game_save=save, version=version, patch=blob_operations)
+    return version, False
@@ -0,0 +1,407 @@
+import numpy as np
+from .story_analysis import CONTEXT_KEYS, DEFAULT_INITIAL, fall_through_edges
+from .story_graph import StoryGraph
+
+
+FINISHED = -1
+STUCK = -2
+MAX_SWEEPS = 8
+PERCENTILE_SAMPLE = 10000
+ENEMY_SKILL_CHANCE = 0.3
+
+
+class PlayerBatch:
+    """Attributes, flags and items of a batch of players, one NumPy array per name."""
+
+    def __init__(self, size, attributes, rng):
+        self.size = size
+        self.rng = rng
+        self.limits = {}
+        self.values = {}
+        self.flags = {}
+
+        for name, initial in DEFAULT_INITIAL.items():
+            self.values[name] = np.full(size, float(initial))
+        for name, config in attributes.items():
+            if not isinstance(config, dict):
+                continue
+            initial = config.get('initial', config.get('初始值', DEFAULT_INITIAL.get(name, 0)))
+            self.values[name] = np.full(size, float(initial))
+            if 'max' in config:
+                self.limits[name] = config['max']
+
+    def value(self, name):
+        if name not in self.values:
+            self.values[name] = np.zeros(self.size)
+        return self.values[name]
+
+    def flag(self, name):
+        if name not in self.flags:
+            self.flags[name] = np.zeros(self.size, dtype=bool)
+        return self.flags[name]
+
+    def apply(self, effects, idx):
+        for key, value in (effects or {}).items():
+            if key in ('items', 'item'):
+                for item in value if isinstance(value, list) else [value]:
+                    self.flag(item)[idx] = True
+            elif isinstance(value, bool):
+                self.flag(key)[idx] = value
+            elif isinstance(value, str):
+                self.flag(key)[idx] = True
+                self.flag(value)[idx] = True
+            elif isinstance(value, (int, float)):
+                column = self.value(key)
+                column[idx] += value
+                if key in self.limits:
+                    column[idx] = np.clip(column[idx], 0, self.limits[key])
+
+    def condition(self, condition, idx, chapter_pos, current_pos):
+        """Boolean mask over `idx` of the players meeting `condition` at chapter position `current_pos`."""
+        mask = np.ones(len(idx), dtype=bool)
+        for key, value in (condition or {}).items():
+            if key in CONTEXT_KEYS and key != 'random_chance':
+                continue
+            if key == 'random_chance':
+                mask &= self.rng.random(len(idx)) < value
+            elif key == 'chapter':
+                mask &= chapter_pos.get(value, len(chapter_pos)) <= current_pos
+            elif key == 'chapter_range':
+                low, high = (chapter_pos.get(c, -1) for c in value)
+                mask &= low <= current_pos <= high
+            elif key in ('item', 'flag', 'quest_completed'):
+                mask &= self.flag(value)[idx]
+            elif key == 'needs_attribute' or key == 'needs_relationship':
+                for name, minimum in value.items():
+                    mask &= self.value(name)[idx] >= minimum
+            elif key == 'needs_item' or key == 'needs_flag':
+                for name in value:
+                    mask &= self.flag(name)[idx]
+            elif isinstance(value, bool):
+                mask &= self.flag(key)[idx] == value
+            elif key.endswith('_range') and isinstance(value, list):
+                column = self.value(key[:-len('_range')])[idx]
+                mask &= (column >= value[0]) & (column <= value[-1])
+            elif isinstance(value, (int, float)):
+                mask &= self.value(key)[idx] >= value
+        return mask
+
+
+class BalanceSimulator:
+    """
+    Monte Carlo playthroughs of the story, side quests and random events,
+    plus battles from battle_system.json, run in NumPy batches so that a
+    million players take seconds. Choices are picked uniformly among the
+    options whose condition the player meets.
+    """
+
+    def __init__(self, chapters, attributes=None, routes=None, quests=None, events=None, battle=None,
+                 quest_rate=1.0, seed=None):
+        chapters = list(chapters)
+        self.graph = StoryGraph.build(chapters)
+        self.flow = fall_through_edges(self.graph)
+        self.attributes = attributes or {}
+        self.routes = (routes or {}).get('story_routes', {})
+        self.quests = (quests or {}).get('side_quests', [])
+        self.events = (events or {}).get('random_events', [])
+        self.battle = battle or {}
+        self.quest_rate = quest_rate
+        self.rng = np.random.default_rng(seed)
+
+        self.chapter_ids = [chapter_id for chapter_id, _ in self.graph.chapters]
+        self.chapter_pos = {chapter_id: pos for pos, chapter_id in enumerate(self.chapter_ids)}
+
+        self.codes = {node_id: code for code, node_id in enumerate(self.graph.locations)}
+        self.nodes = {}
+        self.chapter_nodes = {chapter_id: [] for chapter_id in self.chapter_ids}
+        for chapter in chapters:
+            for scene in chapter.get('scenes', []):
+                for node in (scene.get('content') or {}).get('nodes', []):
+                    node_id = node.get('node_id')
+                    if node_id in self.codes and node_id not in self.nodes:
+                        self.nodes[node_id] = node
+                        self.chapter_nodes[chapter.get('chapter_id')].append(node_id)
+
+        self.tracked = set(DEFAULT_INITIAL) | {
+            name for name, config in self.attributes.items() if isinstance(config, dict)
+        }
+        for route in self.routes.values():
+            self.tracked.update(
+                key for key, value in (route.get('unlock_condition') or {}).items()
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and key not in CONTEXT_KEYS
+            )
+        self.tracked = sorted(self.tracked)
+
+    def _target(self, node_id):
+        targets = self.flow.get(node_id) or []
+        if not targets:
+            return FINISHED
+        return self.codes.get(targets[0], STUCK)
+
+    def _choice_target(self, choice):
+        target = choice.get('next') or choice.get('next_node')
+        if not target:
+            return FINISHED
+        if target in self.codes:
+            return self.codes[target]
+        start = dict(self.graph.chapters).get(target)
+        return self.codes[start] if start else STUCK
+
+    def _play_chapter(self, players, current, chapter_id):
+        pos = self.chapter_pos[chapter_id]
+        codes = [self.codes[node_id] for node_id in self.chapter_nodes[chapter_id]]
+
+        for _ in range(MAX_SWEEPS):
+            for node_id, code in zip(self.chapter_nodes[chapter_id], codes):
+                idx = np.flatnonzero(current == code)
+                if not idx.size:
+                    continue
+                node = self.nodes[node_id]
+                players.apply(node.get('effects'), idx)
+                choices = node.get('choices') or node.get('options') or []
+                if choices:
+                    current[idx] = self._choose(players, idx, choices, pos)
+                else:
+                    current[idx] = self._target(node_id)
+            if not np.isin(current, codes).any():
+                return
+
+        current[np.isin(current, codes)] = STUCK
+
+    def _choose(self, players, idx, choices, pos):
+        available = np.stack([
+            players.condition(choice.get('condition') or choice.get('requirements'), idx, self.chapter_pos, pos)
+            for choice in choices
+        ])
+        counts = available.sum(axis=0)
+        rank = np.floor(self.rng.random(len(idx)) * counts)
+        picked = (np.cumsum(available, axis=0) > rank).argmax(axis=0)
+
+        targets = np.full(len(idx), STUCK)
+        for j, choice in enumerate(choices):
+            chosen = (picked == j) & (counts > 0)
+            players.apply(choice.get('effects'), idx[chosen])
+            targets[chosen] = self._choice_target(choice)
+        return targets
+
+    def _open_at(self, condition, pos):
+        # chapter / chapter_range are the same for the whole batch: skip the event or quest outright
+        condition = condition or {}
+        if 'chapter' in condition and self.chapter_pos.get(condition['chapter'], len(self.chapter_ids)) > pos:
+            return False
+        if 'chapter_range' in condition:
+            low, high = (self.chapter_pos.get(c, -1) for c in condition['chapter_range'])
+            return low <= pos <= high
+        return True
+
+    def _sample(self, size, chance):
+        """Indices below `size` each kept with probability `chance`, drawn as geometric gaps."""
+        if chance >= 1:
+            return np.arange(size)
+        if chance <= 0:
+            return np.arange(0)
+        expected = size * chance
+        idx = np.cumsum(self.rng.geometric(chance, int(expected + 6 * np.sqrt(expected)) + 16)) - 1
+        while idx[-1] < size:
+            idx = np.concatenate([idx, idx[-1] + np.cumsum(self.rng.geometric(chance, idx.size // 2 + 16))])
+        return idx[idx < size]
+
+    def _roll_events(self, players, pos, stats):
+        for event in self.events:
+            condition = event.get('trigger_condition')
+            if not self._open_at(condition, pos):
+                continue
+            idx = self._sample(players.size, event.get('trigger_chance', 1.0))
+            idx = idx[players.condition(condition, idx, self.chapter_pos, pos)]
+            stats[event.get('event_id')] = stats.get(event.get('event_id'), 0) + idx.size
+            choices = event.get('choices') or []
+            if not idx.size or not choices:
+                continue
+            available = np.stack([
+                players.condition(choice.get('condition'), idx, self.chapter_pos, pos) for choice in choices
+            ])
+            counts = available.sum(axis=0)
+            rank = np.floor(self.rng.random(idx.size) * counts)
+            picked = (np.cumsum(available, axis=0) > rank).argmax(axis=0)
+            for j, choice in enumerate(choices):
+                chosen = idx[(picked == j) & (counts > 0)]
+                players.apply(choice.get('effects'), chosen)
+                if choice.get('unlock_quest'):
+                    players.flag(choice['unlock_quest'])[chosen] = True
+
+    def _run_quests(self, players, pos, stats):
+        for quest in self.quests:
+            condition = quest.get('unlock_condition')
+            if not self._open_at(condition, pos):
+                continue
+            done = players.flag(quest['quest_id'])
+            idx = np.flatnonzero(~done)
+            idx = idx[self._sample(idx.size, self.quest_rate)]
+            idx = idx[players.condition(condition, idx, self.chapter_pos, pos)]
+            players.apply(quest.get('rewards'), idx)
+            done[idx] = True
+            stats[quest['quest_id']] = stats.get(quest['quest_id'], 0) + idx.size
+
+    def _snapshot(self, players, chapter_stats):
+        # Percentiles come from the first PERCENTILE_SAMPLE players only, means from everyone
+        if not chapter_stats:
+            sample = np.stack([players.value(name)[:PERCENTILE_SAMPLE] for name in self.tracked])
+            for name, percentiles in zip(self.tracked, np.percentile(sample, [10, 50, 90], axis=1).T):
+                chapter_stats[name] = {'sum': 0.0, 'percentiles': [float(p) for p in percentiles]}
+        for name in self.tracked:
+            chapter_stats[name]['sum'] += float(players.value(name).sum())
+
+    def _play_batch(self, size, totals):
+        players = PlayerBatch(size, self.attributes, self.rng)
+        start = self.graph.chapters[0][1] if self.graph.chapters else None
+        current = np.full(size, self.codes[start] if start else FINISHED)
+
+        for pos, chapter_id in enumerate(self.chapter_ids):
+            self._play_chapter(players, current, chapter_id)
+            self._roll_events(players, pos, totals['events'])
+            self._run_quests(players, pos, totals['quests'])
+            self._snapshot(players, totals['chapters'].setdefault(chapter_id, {}))
+
+        totals['stuck'] += int((current == STUCK).sum())
+        end = len(self.chapter_ids)
+        everyone = np.arange(size)
+        for route_id, route in self.routes.items():
+            met = players.condition(route.get('unlock_condition'), everyone, self.chapter_pos, end)
+            entry = totals['routes'].setdefault(route_id, {'condition': 0, 'unlocked': 0})
+            entry['condition'] += int(met.sum())
+            entry['unlocked'] += int((met | players.flag(route_id)).sum())
+
+        for enemy in self.battle.get('enemies', []):
+            outcome = self._fight(players, enemy)
+            entry = totals['battles'].setdefault(enemy['enemy_id'], {'win': 0, 'loss': 0, 'draw': 0, 'rounds': 0})
+            for key, value in outcome.items():
+                entry[key] += value
+
+    def _fight(self, players, enemy):
+        """Player attacks first each round with the strongest ready skill, mirroring battle.js."""
+        mechanics = (self.battle.get('battle_system') or {}).get('combat_mechanics', {})
+        calculation = (self.battle.get('battle_system') or {}).get('damage_calculation', {})
+        crit_chance = mechanics.get('critical_chance_base', 0)
+        crit_multiplier = calculation.get('critical_multiplier', 1)
+        dodge_chance = mechanics.get('dodge_chance_base', 0)
+        max_rounds = mechanics.get('max_rounds', 20)
+
+        n = players.size
+        everyone = np.arange(n)
+        rng = self.rng
+        attack = np.where(players.value('strength') > 0, players.value('strength'), 50)
+        defense = np.where(players.value('defense') > 0, players.value('defense'), 30)
+        hp = np.where(players.value('health') > 0, players.value('health'), 100).astype(float)
+        stamina = np.full(n, 100.0)
+
+        stats = enemy.get('stats', {})
+        enemy_hp = np.full(n, float(stats.get('max_hp', 100)))
+        enemy_stamina = np.full(n, float(stats.get('max_stamina', 100)))
+        enemy_attack = stats.get('attack', 10)
+        enemy_defense = stats.get('defense', 0)
+        enemy_skills = enemy.get('skills', [])
+
+        skills = sorted(self.battle.get('skills', []), key=lambda s: s.get('damage_multiplier', 1), reverse=True)
+        learned = [
+            players.condition(skill.get('unlock_condition'), everyone, self.chapter_pos, len(self.chapter_ids))
+            for skill in skills
+        ]
+        cooldowns = [np.zeros(n) for _ in skills]
+
+        def damage(attacker, defender, multiplier):
+            m = len(multiplier)
+            value = np.floor(attacker * multiplier * (1 + (attacker - defender) / 100) * rng.uniform(0.9, 1.1, m))
+            value = np.maximum(1, value)
+            value[rng.random(m) < crit_chance] *= crit_multiplier
+            value[rng.random(m) < dodge_chance] = 0
+            return value
+
+        # Only players still fighting are simulated each round; most battles end in a few rounds
+        active = everyone
+        won = np.zeros(n, dtype=bool)
+        lost = np.zeros(n, dtype=bool)
+        rounds = np.zeros(n)
+
+        for _ in range(max_rounds):
+            if not active.size:
+                break
+            multiplier = np.ones(active.size)
+            unused = np.ones(active.size, dtype=bool)
+            for skill, known, cooldown in zip(skills, learned, cooldowns):
+                cost = skill.get('stamina_cost', 0)
+                left = cooldown[active]
+                ready = unused & known[active] & (left <= 0) & (stamina[active] >= cost)
+                multiplier[ready] = skill.get('damage_multiplier', 1)
+                stamina[active[ready]] -= cost
+                left -= 1
+                left[ready] = skill.get('cooldown', 0)
+                cooldown[active] = left
+                unused &= ~ready
+
+            enemy_hp[active] -= damage(attack[active], enemy_defense, multiplier)
+            rounds[active] += 1
+            beaten = enemy_hp[active] <= 0
+            won[active[beaten]] = True
+            active = active[~beaten]
+
+            enemy_multiplier = np.ones(active.size)
+            if enemy_skills and active.size:
+                skill_roll = rng.random(active.size) < ENEMY_SKILL_CHANCE
+                chosen = rng.integers(0, len(enemy_skills), active.size)
+                for j, skill in enumerate(enemy_skills):
+                    cost = skill.get('stamina_cost', 0)
+                    use = skill_roll & (chosen == j) & (enemy_stamina[active] >= cost)
+                    enemy_multiplier[use] = skill.get('damage', 50) / 50
+                    enemy_stamina[active[use]] -= cost
+
+            hp[active] -= damage(enemy_attack, defense[active], enemy_multiplier)
+            fallen = hp[active] <= 0
+            lost[active[fallen]] = True
+            active = active[~fallen]
+
+        return {
+            'win': int(won.sum()),
+            'loss': int(lost.sum()),
+            'draw': int(active.size),
+            'rounds': float(rounds.sum()),
+        }
+
+    def run(self, players=1000000, batch_size=100000):
+        totals = {'stuck': 0, 'events': {}, 'quests': {}, 'chapters': {}, 'routes': {}, 'battles': {}}
+        remaining = players
+        while remaining > 0:
+            size = min(batch_size, remaining)
+            self._play_batch(size, totals)
+            remaining -= size
+
+        return {
+            'players': players,
+            'stuck_rate': totals['stuck'] / players,
+            'routes': {
+                route_id: {key: count / players for key, count in entry.items()}
+                for route_id, entry in totals['routes'].items()
+            },
+            'battles': {
+                enemy_id: {
+                    'win_rate': entry['win'] / players,
+                    'loss_rate': entry['loss'] / players,
+                    'draw_rate': entry['draw'] / players,
+                    'avg_rounds': entry['rounds'] / players,
+                }
+                for enemy_id, entry in totals['battles'].items()
+            },
+            'quests': {quest_id: count / players for quest_id, count in totals['quests'].items()},
+            'events': {event_id: count / players for event_id, count in totals['events'].items()},
+            'chapters': {
+                chapter_id: {
+                    name: {
+                        'mean': entry['sum'] / players,
+                        'p10': entry['percentiles'][0],
+                        'p50': entry['percentiles'][1],
+                        'p90': entry['percentiles'][2],
+                    }
+                    for name, entry in attributes.items()
+                }
+                for chapter_id, attributes in totals['chapters'].items()
+            },
+        }
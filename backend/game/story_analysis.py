@@ -0,0 +1,324 @@
+import math
+from collections import defaultdict, deque
+from .story_graph import StoryGraph
+
+
+DEFAULT_INITIAL = {'strength': 10, 'intelligence': 10, 'charisma': 10, 'luck': 10}
+
+# Checked by the client against time, weather or dice, not against player progress
+CONTEXT_KEYS = {'time_of_day', 'weather', 'action', 'cultivation_progress', 'random_chance', 'exploration'}
+
+
+def fall_through_edges(graph):
+    """
+    The client plays a node without `next` into the first node of the next
+    scene, or of the next chapter after a chapter's last scene.
+    """
+    scene_starts = {}
+    for node_id, (chapter_id, _, scene_index, node_index) in graph.locations.items():
+        key = (chapter_id, scene_index)
+        if key not in scene_starts or node_index < graph.locations[scene_starts[key]][3]:
+            scene_starts[key] = node_id
+
+    scenes_by_chapter = defaultdict(list)
+    for chapter_id, scene_index in scene_starts:
+        scenes_by_chapter[chapter_id].append(scene_index)
+
+    following = {}
+    chapter_ids = [chapter_id for chapter_id, _ in graph.chapters]
+    next_start = None
+    for chapter_id in reversed(chapter_ids):
+        for scene_index in sorted(scenes_by_chapter[chapter_id], reverse=True):
+            following[(chapter_id, scene_index)] = next_start
+            next_start = scene_starts[(chapter_id, scene_index)]
+
+    edges = {}
+    for node_id, (chapter_id, _, scene_index, _) in graph.locations.items():
+        if graph.edges.get(node_id):
+            edges[node_id] = graph.edges[node_id]
+        else:
+            target = following.get((chapter_id, scene_index))
+            edges[node_id] = [target] if target else []
+    return edges
+
+
+def _strongly_connected(nodes, edges):
+    """Iterative Tarjan: yields each strongly connected component once, O(V + E)."""
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    counter = 0
+
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(edges.get(root, [])))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+
+        while work:
+            node, targets = work[-1]
+            advanced = False
+            for target in targets:
+                if target not in nodes:
+                    continue
+                if target not in index:
+                    index[target] = low[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack.add(target)
+                    work.append((target, iter(edges.get(target, []))))
+                    advanced = True
+                    break
+                if target in on_stack:
+                    low[node] = min(low[node], index[target])
+            if advanced:
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                yield component
+
+
+class StoryAnalyzer:
+    """
+    Whole-project static checks over story_tree plus the route, side quest
+    and random event tables. Every pass is linear in nodes + edges.
+    """
+
+    def __init__(self, chapters, routes=None, quests=None, events=None, attributes=None):
+        self.chapters = list(chapters)
+        self.graph = StoryGraph.build(self.chapters)
+        self.routes = (routes or {}).get('story_routes', {})
+        self.route_detection = (routes or {}).get('route_detection', {})
+        self.quests = {quest['quest_id']: quest for quest in (quests or {}).get('side_quests', [])}
+        self.events = (events or {}).get('random_events', [])
+        self.attributes = attributes or {}
+
+    def analyze(self):
+        flow = fall_through_edges(self.graph)
+        start = self.graph.chapters[0][1] if self.graph.chapters else None
+        reachable = self._reachable(start, flow)
+
+        looping = set()
+        traps = []
+        for component in _strongly_connected(self.graph.locations, flow):
+            if len(component) == 1 and component[0] not in flow.get(component[0], []):
+                continue
+            looping.update(component)
+            if self._is_trap(component, flow):
+                traps.append(sorted(component))
+
+        self.choice_ids = set()
+        self.items = set()
+        self.setters = set()
+        self.gains = defaultdict(int)
+        self._collect_story_effects(reachable, looping)
+        self._collect_table_effects()
+
+        report = {
+            'node_count': len(self.graph.locations),
+            'reachable_count': len(reachable),
+            'unreachable_nodes': sorted(set(self.graph.locations) - reachable),
+            'broken_edges': self._broken_edges(),
+            'cross_scene_edges': self._cross_scene_edges(),
+            'traps': traps,
+            'broken_references': self._broken_references(),
+            'infeasible': self._infeasible_conditions(),
+            'attribute_bounds': {
+                name: (None if math.isinf(value) else value)
+                for name, value in sorted(self._bounds().items())
+            },
+        }
+        report['error_count'] = sum(
+            len(report[key]) for key in ('broken_edges', 'traps', 'broken_references', 'infeasible')
+        )
+        return report
+
+    def _reachable(self, start, flow):
+        if not start:
+            return set()
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            for target in flow.get(queue.popleft(), []):
+                if target in self.graph.locations and target not in seen:
+                    seen.add(target)
+                    queue.append(target)
+        return seen
+
+    def _broken_edges(self):
+        return [{'from': source, 'to': target} for source, target in self.graph.dangling_edges()]
+
+    def _cross_scene_edges(self):
+        # The client resolves `next` inside the current scene only, so these stall at runtime
+        edges = []
+        for source, targets in self.graph.edges.items():
+            chapter_id, _, scene_index, _ = self.graph.locations[source]
+            for target in targets:
+                location = self.graph.locations.get(target)
+                if location and (location[0], location[2]) != (chapter_id, scene_index):
+                    edges.append({'from': source, 'to': target})
+        return edges
+
+    def _is_trap(self, component, flow):
+        # A cycle is a trap when no member ends the story or leads out of it
+        members = set(component)
+        return not any(
+            not flow.get(node) or any(target not in members for target in flow[node])
+            for node in component
+        )
+
+    def _collect_story_effects(self, reachable, looping):
+        # A node that can repeat (inside a cycle) makes its positive effects unbounded
+        for chapter in self.chapters:
+            for scene in chapter.get('scenes', []):
+                for node in (scene.get('content') or {}).get('nodes', []):
+                    node_id = node.get('node_id')
+                    choices = node.get('choices') or node.get('options') or []
+                    for choice in choices:
+                        if choice.get('id') or choice.get('choice_id'):
+                            self.choice_ids.add(choice.get('id') or choice.get('choice_id'))
+                    if node_id not in reachable:
+                        continue
+                    repeat = math.inf if node_id in looping else 1
+                    if node.get('item_id'):
+                        self.items.add(node['item_id'])
+                    self._add_effects([node.get('effects') or {}], repeat)
+                    self._add_effects([choice.get('effects') or {} for choice in choices], repeat)
+
+    def _collect_table_effects(self):
+        for quest in self.quests.values():
+            self._add_effects([quest.get('rewards') or {}])
+        for event in self.events:
+            choices = event.get('choices', [])
+            for choice in choices:
+                if choice.get('choice_id'):
+                    self.choice_ids.add(choice['choice_id'])
+                if choice.get('unlock'):
+                    self.setters.add(choice['unlock'])
+            self._add_effects([choice.get('effects') or {} for choice in choices])
+
+    def _add_effects(self, alternatives, repeat=1):
+        # Only one alternative of a choice is taken: the best one bounds the gain
+        best = {}
+        for effects in alternatives:
+            for key, value in effects.items():
+                if key in ('items', 'item'):
+                    self.items.update(value if isinstance(value, list) else [value])
+                elif isinstance(value, bool) or isinstance(value, str):
+                    self.setters.add(key)
+                    if isinstance(value, str):
+                        self.setters.add(value)
+                elif isinstance(value, (int, float)) and value > 0:
+                    best[key] = max(best.get(key, 0), value)
+        for key, value in best.items():
+            self.gains[key] += value * repeat
+
+    def _bounds(self):
+        bounds = {}
+        names = set(self.gains) | set(self.attributes) | set(DEFAULT_INITIAL)
+        for name in names:
+            config = self.attributes.get(name) or {}
+            initial = config.get('initial', config.get('初始值', DEFAULT_INITIAL.get(name, 0)))
+            value = initial + self.gains.get(name, 0)
+            if 'max' in config:
+                value = min(value, config['max'])
+            bounds[name] = value
+        return bounds
+
+    def _condition_problems(self, condition, bounds, chapter_ids):
+        problems = []
+        for key, value in (condition or {}).items():
+            if key in CONTEXT_KEYS or key.startswith('needs_'):
+                continue
+            if key == 'chapter':
+                if value not in chapter_ids:
+                    problems.append(f'章节 {value} 不存在')
+            elif key == 'chapter_range':
+                problems.extend(f'章节 {c} 不存在' for c in value if c not in chapter_ids)
+            elif key == 'quest_completed':
+                if value not in self.quests:
+                    problems.append(f'任务 {value} 不存在')
+            elif key == 'item':
+                if value not in self.items:
+                    problems.append(f'物品 {value} 无法获得')
+            elif key == 'flag' or isinstance(value, bool):
+                flag = value if key == 'flag' else key
+                if value is not False and flag not in self.setters:
+                    problems.append(f'标记 {flag} 无处设置')
+            elif key.endswith('_range') and isinstance(value, list) and value:
+                name = key[:-len('_range')]
+                if bounds.get(name, 0) < value[0]:
+                    problems.append(f'{name} 最多 {bounds.get(name, 0)}，需要 {value[0]}')
+            elif isinstance(value, (int, float)):
+                if bounds.get(key, 0) < value:
+                    problems.append(f'{key} 最多 {bounds.get(key, 0)}，需要 {value}')
+        return problems
+
+    def _infeasible_conditions(self):
+        bounds = self._bounds()
+        chapter_ids = {chapter_id for chapter_id, _ in self.graph.chapters}
+        results = []
+
+        def check(kind, owner, condition):
+            problems = self._condition_problems(condition, bounds, chapter_ids)
+            if problems:
+                results.append({'type': kind, 'id': owner, 'problems': problems})
+
+        for route_id, route in self.routes.items():
+            check('route', route_id, route.get('unlock_condition'))
+        for quest_id, quest in self.quests.items():
+            check('quest', quest_id, quest.get('unlock_condition'))
+        for event in self.events:
+            check('event', event.get('event_id'), event.get('trigger_condition'))
+            for choice in event.get('choices', []):
+                check('choice', choice.get('choice_id'), choice.get('condition'))
+        for chapter in self.chapters:
+            for scene in chapter.get('scenes', []):
+                for node in (scene.get('content') or {}).get('nodes', []):
+                    for choice in node.get('choices') or node.get('options') or []:
+                        check('choice', choice.get('id') or node.get('node_id'), choice.get('condition'))
+        return results
+
+    def _broken_references(self):
+        chapter_ids = {chapter_id for chapter_id, _ in self.graph.chapters}
+        broken = []
+
+        def ref(owner, kind, target, known):
+            if target and target not in known:
+                broken.append({'from': owner, 'type': kind, 'to': target})
+
+        for route_id, route in self.routes.items():
+            for choice_id in route.get('key_choices', []):
+                ref(route_id, 'choice', choice_id, self.choice_ids)
+            for route_chapter in route.get('route_chapters', []):
+                trigger = route_chapter.get('trigger') or ''
+                if trigger.endswith('_complete'):
+                    ref(route_id, 'chapter', trigger[:-len('_complete')], chapter_ids)
+        for point in self.route_detection.get('detection_points', []):
+            ref('route_detection', 'chapter', point.get('chapter'), chapter_ids)
+            for choice_id in point.get('check_choices', []):
+                ref('route_detection', 'choice', choice_id, self.choice_ids)
+
+        for quest_id, quest in self.quests.items():
+            ref(quest_id, 'quest', quest.get('quest_chain'), self.quests)
+            ref(quest_id, 'route', (quest.get('rewards') or {}).get('unlock_route'), self.routes)
+        for event in self.events:
+            for choice in event.get('choices', []):
+                ref(choice.get('choice_id'), 'quest', choice.get('unlock_quest'), self.quests)
+                ref(choice.get('choice_id'), 'route', (choice.get('effects') or {}).get('unlock_route'), self.routes)
+        return broken
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import threading
+from collections import deque
+from django.conf import settings
+from .models import Chapter
+from .story_store import ensure_story_synced
+
+
+GRAPH_VERSION = 2
+END_MARKERS = {'end_chapter'}
+
+
+def node_successors(node):
+    targets = []
+    for key in ('next', 'next_node', 'success_next', 'fail_next'):
+        if isinstance(node.get(key), str) and node[key] not in END_MARKERS:
+            targets.append(node[key])
+    for choice in node.get('choices') or node.get('options') or []:
+        for key in ('next', 'next_node'):
+            if isinstance(choice.get(key), str) and choice[key] not in END_MARKERS:
+                targets.append(choice[key])
+    return list(dict.fromkeys(targets))
+
+
+class StoryGraph:
+    """
+    Index over story_tree chapters: node_id -> location, adjacency and reverse
+    edges, and per-chapter entry/exit nodes. Built in one pass, so lookups and
+    traversals no longer rescan the chapter/scene/node lists.
+    """
+
+    def __init__(self, version, chapters, locations, edges):
+        self.version = version
+        self.chapters = chapters
+        self.locations = locations
+        self.edges = edges
+
+        self.reverse = {node_id: [] for node_id in locations}
+        for source, targets in edges.items():
+            for target in targets:
+                self.reverse.setdefault(target, []).append(source)
+
+        self.chapter_entries = {}
+        self.chapter_exits = {}
+        for chapter_id, first_node in chapters:
+            self.chapter_entries[chapter_id] = [first_node] if first_node else []
+            self.chapter_exits[chapter_id] = []
+
+        for node_id, (chapter_id, scene_id, scene_index, node_index) in locations.items():
+            targets = edges.get(node_id, [])
+            if not targets or any(self.chapter_of(t) != chapter_id for t in targets):
+                self.chapter_exits[chapter_id].append(node_id)
+            if any(self.chapter_of(s) != chapter_id for s in self.reverse[node_id]):
+                if node_id not in self.chapter_entries[chapter_id]:
+                    self.chapter_entries[chapter_id].append(node_id)
+
+    @classmethod
+    def build(cls, chapters, version=''):
+        chapter_list = []
+        locations = {}
+        edges = {}
+
+        for chapter in chapters:
+            chapter_id = chapter.get('chapter_id')
+            first_node = None
+            for scene_index, scene in enumerate(chapter.get('scenes', [])):
+                nodes = (scene.get('content') or {}).get('nodes', [])
+                for node_index, node in enumerate(nodes):
+                    node_id = node.get('node_id')
+                    if not node_id or node_id in locations:
+                        continue
+                    first_node = first_node or node_id
+                    locations[node_id] = (chapter_id, scene.get('scene_id', ''), scene_index, node_index)
+                    edges[node_id] = node_successors(node)
+            chapter_list.append((chapter_id, first_node))
+
+        # A `next` naming a chapter jumps to that chapter's first node
+        chapter_starts = {chapter_id: first_node for chapter_id, first_node in chapter_list if first_node}
+        for node_id, targets in edges.items():
+            if any(target in chapter_starts and target not in locations for target in targets):
+                edges[node_id] = [
+                    chapter_starts[t] if t in chapter_starts and t not in locations else t for t in targets
+                ]
+
+        return cls(version, chapter_list, locations, edges)
+
+    def to_dict(self):
+        return {
+            'graph_version': GRAPH_VERSION,
+            'version': self.version,
+            'chapters': self.chapters,
+            'locations': self.locations,
+            'edges': self.edges,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['version'],
+            [tuple(chapter) for chapter in data['chapters']],
+            {node_id: tuple(location) for node_id, location in data['locations'].items()},
+            data['edges']
+        )
+
+    def locate(self, node_id):
+        return self.locations.get(node_id)
+
+    def chapter_of(self, node_id):
+        location = self.locations.get(node_id)
+        return location[0] if location else None
+
+    def successors(self, node_id):
+        return self.edges.get(node_id, [])
+
+    def predecessors(self, node_id):
+        return self.reverse.get(node_id, [])
+
+    def dangling_edges(self):
+        return [
+            (source, target)
+            for source, targets in self.edges.items()
+            for target in targets
+            if target not in self.locations
+        ]
+
+    def reachable_from(self, start_nodes):
+        seen = set()
+        queue = deque(node_id for node_id in start_nodes if node_id in self.locations)
+        seen.update(queue)
+        while queue:
+            for target in self.edges.get(queue.popleft(), []):
+                if target in self.locations and target not in seen:
+                    seen.add(target)
+                    queue.append(target)
+        return seen
+
+
+def _graph_dir():
+    return settings.GAME_DATA_DIR / 'graphs'
+
+
+def _project_version(project_id):
+    digest = hashlib.sha256()
+    rows = Chapter.objects.filter(project_id=project_id).exclude(content_hash='').order_by('order', 'id')
+    for chapter_id, content_hash in rows.values_list('chapter_id', 'content_hash'):
+        digest.update(f'{chapter_id}:{content_hash};'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _load_from_disk(project_id, version):
+    path = _graph_dir() / f'{project_id}_{version}.json'
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('graph_version') != GRAPH_VERSION or data.get('version') != version:
+        return None
+    return StoryGraph.from_dict(data)
+
+
+def _save_to_disk(project_id, graph):
+    graph_dir = _graph_dir()
+    graph_dir.mkdir(parents=True, exist_ok=True)
+
+    for stale in graph_dir.glob(f'{project_id}_*.json'):
+        stale.unlink(missing_ok=True)
+
+    path = graph_dir / f'{project_id}_{graph.version}.json'
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(graph.to_dict(), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def get_story_graph(project_id):
+    """The project's StoryGraph for its current chapter hashes, from memory, disk or a fresh build."""
+    if not ensure_story_synced(project_id):
+        return None
+
+    version = _project_version(project_id)
+    with _graphs_lock:
+        graph = _graphs.get(project_id)
+    if graph is not None and graph.version == version:
+        return graph
+
+    graph = _load_from_disk(project_id, version)
+    if graph is None:
+        rows = Chapter.objects.filter(project_id=project_id).exclude(
+            content_hash=''
+        ).order_by('order', 'id').only('story')
+        graph = StoryGraph.build((row.story for row in rows.iterator(chunk_size=100)), version)
+        _save_to_disk(project_id, graph)
+
+    with _graphs_lock:
+        _graphs[project_id] = graph
+    return graph
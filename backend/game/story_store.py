@@ -0,0 +1,211 @@
+import hashlib
+import json
+from django.db import transaction
+from django.db.models import Q
+from .models import GameProject, Chapter, StoryNode
+
+
+MAX_PREFETCH = 20
+
+
+def _serialize(chapter_data):
+    return json.dumps(chapter_data, ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+
+def chapter_hash(chapter_data):
+    return hashlib.sha256(_serialize(chapter_data)).hexdigest()
+
+
+def sync_story_tree(project):
+    """
+    Mirror project.story_tree['chapters'] into per-chapter Chapter.story blobs
+    and a StoryNode index. Chapters whose hash is unchanged are not written,
+    so an edit costs one chapter rather than the whole book.
+    """
+    chapters = (project.story_tree or {}).get('chapters', [])
+    existing = {
+        chapter.chapter_id: chapter
+        for chapter in Chapter.objects.filter(project=project).only('id', 'chapter_id', 'content_hash')
+    }
+    seen = set()
+
+    with transaction.atomic():
+        for position, chapter_data in enumerate(chapters, 1):
+            chapter_id = chapter_data.get('chapter_id')
+            if not chapter_id or chapter_id in seen:
+                continue
+            seen.add(chapter_id)
+            _write_chapter(project, chapter_data, position, existing.get(chapter_id))
+
+        # Chapters dropped from the tree keep their row (it may hold novel text) but lose their story
+        removed = [
+            chapter.id for chapter_id, chapter in existing.items()
+            if chapter_id not in seen and chapter.content_hash
+        ]
+        if removed:
+            StoryNode.objects.filter(chapter_id__in=removed).delete()
+            Chapter.objects.filter(id__in=removed).update(story={}, story_size=0, content_hash='')
+
+
+def ensure_story_synced(project_id):
+    # Projects written before per-chapter storage existed are split on their first read
+    if Chapter.objects.filter(project_id=project_id).exclude(content_hash='').exists():
+        return True
+
+    project = GameProject.objects.filter(id=project_id).only('id', 'story_tree').first()
+    if project is None:
+        return False
+
+    sync_story_tree(project)
+    return True
+
+
+def save_chapters(project, chapter_ids):
+    """
+    Save project.story_tree, already edited in memory, and mirror only the
+    named chapters into the per-chapter store. Other chapters are neither
+    hashed nor written; a named chapter no longer in the tree loses its story.
+    """
+    wanted = set(chapter_ids)
+    positions = {}
+    for position, chapter_data in enumerate((project.story_tree or {}).get('chapters', []), 1):
+        if chapter_data.get('chapter_id') in wanted:
+            positions.setdefault(chapter_data['chapter_id'], (position, chapter_data))
+
+    existing = {
+        chapter.chapter_id: chapter
+        for chapter in Chapter.objects.filter(project=project, chapter_id__in=wanted).only('id', 'chapter_id', 'content_hash')
+    }
+
+    with transaction.atomic():
+        project.save(update_fields=['story_tree', 'updated_at'])
+        for chapter_id, (position, chapter_data) in positions.items():
+            _write_chapter(project, chapter_data, position, existing.get(chapter_id))
+
+        removed = [
+            chapter.id for chapter_id, chapter in existing.items()
+            if chapter_id not in positions and chapter.content_hash
+        ]
+        if removed:
+            StoryNode.objects.filter(chapter_id__in=removed).delete()
+            Chapter.objects.filter(id__in=removed).update(story={}, story_size=0, content_hash='')
+
+
+def chapter_ids_at_path(story_tree, path):
+    """
+    The chapter an edit at `path` falls in: 'story_tree.chapters.3.scenes'
+    -> {id of chapter 3}. None when the edit is not confined to one chapter.
+    """
+    parts = path.split('.')
+    if len(parts) < 3 or parts[:2] != ['story_tree', 'chapters'] or not parts[2].isdigit():
+        return None
+
+    chapters = (story_tree or {}).get('chapters', [])
+    index = int(parts[2])
+    if index < len(chapters) and isinstance(chapters[index], dict) and chapters[index].get('chapter_id'):
+        return {chapters[index]['chapter_id']}
+    return set()
+
+
+def _write_chapter(project, chapter_data, position, chapter):
+    payload = _serialize(chapter_data)
+    digest = hashlib.sha256(payload).hexdigest()
+
+    if chapter and chapter.content_hash == digest:
+        return
+
+    # Title, order and content of existing rows belong to whoever created them (e.g. the bootstrap tools)
+    if chapter is None:
+        chapter = Chapter.objects.create(
+            project=project,
+            chapter_id=chapter_data['chapter_id'],
+            title=chapter_data.get('chapter_name') or chapter_data.get('title') or chapter_data['chapter_id'],
+            order=position,
+            story=chapter_data,
+            story_size=len(payload),
+            content_hash=digest
+        )
+    else:
+        chapter.story = chapter_data
+        chapter.story_size = len(payload)
+        chapter.content_hash = digest
+        chapter.save(update_fields=['story', 'story_size', 'content_hash'])
+        StoryNode.objects.filter(chapter=chapter).delete()
+
+    StoryNode.objects.bulk_create(_index_nodes(project, chapter, chapter_data), ignore_conflicts=True)
+
+
+def _index_nodes(project, chapter, chapter_data):
+    for scene_index, scene in enumerate(chapter_data.get('scenes', [])):
+        nodes = (scene.get('content') or {}).get('nodes', [])
+        for node_index, node in enumerate(nodes):
+            if not node.get('node_id'):
+                continue
+            yield StoryNode(
+                project=project,
+                chapter=chapter,
+                node_id=node['node_id'],
+                scene_id=scene.get('scene_id', ''),
+                scene_index=scene_index,
+                node_index=node_index
+            )
+
+
+def _stored_chapters(project_id):
+    return Chapter.objects.filter(project_id=project_id).exclude(content_hash='').order_by('order', 'id')
+
+
+def get_chapter_order(project_id):
+    """{chapter_id: position} in reading order."""
+    chapter_ids = _stored_chapters(project_id).values_list('chapter_id', flat=True)
+    return {chapter_id: position for position, chapter_id in enumerate(chapter_ids)}
+
+
+def get_manifest(project_id, offset=0, limit=None):
+    chapters = _stored_chapters(project_id).values_list('chapter_id', 'title', 'story_size', 'content_hash')
+    total = chapters.count()
+    end = total if limit is None else offset + max(0, limit)
+
+    return total, [
+        {'chapter_id': chapter_id, 'title': title, 'size': size, 'hash': digest}
+        for chapter_id, title, size, digest in chapters[offset:end]
+    ]
+
+
+def get_chapters_from(project_id, chapter_id=None, count=1):
+    """The chapter `chapter_id` (or the first one) and the chapters after it, `count` in all."""
+    chapters = _stored_chapters(project_id)
+
+    if chapter_id:
+        start = chapters.filter(chapter_id=chapter_id).values('id', 'order').first()
+        if start is None:
+            return None
+        chapters = chapters.filter(Q(order__gt=start['order']) | Q(order=start['order'], id__gte=start['id']))
+
+    return list(chapters.only('chapter_id', 'title', 'order', 'story', 'content_hash')[:min(count, MAX_PREFETCH)])
+
+
+def get_chapter_story(project_id, chapter_id):
+    chapter = Chapter.objects.filter(
+        project_id=project_id,
+        chapter_id=chapter_id
+    ).exclude(content_hash='').only('chapter_id', 'title', 'order', 'story', 'content_hash').first()
+
+    return chapter
+
+
+def find_node(project_id, node_id):
+    entry = StoryNode.objects.filter(
+        project_id=project_id,
+        node_id=node_id
+    ).select_related('chapter').first()
+
+    if not entry:
+        return None
+
+    scene = entry.chapter.story['scenes'][entry.scene_index]
+    return {
+        'chapter_id': entry.chapter.chapter_id,
+        'scene_id': entry.scene_id,
+        'node': scene['content']['nodes'][entry.node_index],
+    }
@@ -0,0 +1,146 @@
+import json
+from django.test import SimpleTestCase, TestCase
+from .conditions import PlayerState, compile_condition, evaluate_condition
+from .models import GameProject, GameSave
+from .save_store import PatchError, SNAPSHOT_INTERVAL, save_delta
+
+
+def check(condition, **player_state):
+    order = {'chapter_001': 1, 'chapter_002': 2, 'chapter_003': 3, 'chapter_004': 4}
+    return compile_condition(condition)(PlayerState(player_state, order))
+
+
+class ConditionTests(SimpleTestCase):
+
+    def test_item(self):
+        self.assertTrue(check({'item': 'a'}, inventory=['a']))
+        self.assertFalse(check({'item': 'a'}, inventory=['b']))
+        self.assertTrue(check({'item': 'a'}, inventory=[{'item_id': 'a'}]))
+
+    def test_item_list(self):
+        self.assertTrue(check({'item': ['a', 'b']}, inventory=['a', 'b', 'c']))
+        self.assertFalse(check({'item': ['a', 'b']}, inventory=['a']))
+
+    def test_flag(self):
+        self.assertTrue(check({'flag': 'met'}, flags=['met']))
+        self.assertFalse(check({'flag': 'met'}, flags=[]))
+
+    def test_flag_list(self):
+        self.assertTrue(check({'flag': ['met', 'won']}, flags=['met', 'won']))
+        self.assertFalse(check({'flag': ['met', 'won']}, flags=['met']))
+
+    def test_boolean_flag(self):
+        self.assertTrue(check({'met_yaolao': True}, flags=['met_yaolao']))
+        self.assertFalse(check({'met_yaolao': True}, flags=[]))
+        self.assertTrue(check({'met_yaolao': False}, flags=[]))
+
+    def test_numeric_stat(self):
+        self.assertTrue(check({'intelligence': 65}, attributes={'intelligence': 70}))
+        self.assertFalse(check({'intelligence': 65}, attributes={'intelligence': 60}))
+        self.assertTrue(check({'relationship_xuner': 30}, relationships={'relationship_xuner': 30}))
+
+    def test_quest_completed(self):
+        self.assertTrue(check({'quest_completed': 'quest_001'}, completed_quests=['quest_001']))
+        self.assertFalse(check({'quest_completed': 'quest_001'}, completed_quests=['quest_002']))
+        self.assertFalse(check({'quest_completed': 'quest_001'}))
+
+    def test_chapter(self):
+        self.assertTrue(check({'chapter': 'chapter_002'}, current_chapter='chapter_003'))
+        self.assertFalse(check({'chapter': 'chapter_003'}, current_chapter='chapter_002'))
+
+    def test_chapter_range(self):
+        condition = {'chapter_range': ['chapter_002', 'chapter_003']}
+        self.assertTrue(check(condition, current_chapter='chapter_002'))
+        self.assertTrue(check(condition, current_chapter='chapter_003'))
+        self.assertFalse(check(condition, current_chapter='chapter_001'))
+        self.assertFalse(check(condition, current_chapter='chapter_004'))
+        self.assertFalse(check({'chapter_range': ['chapter_002', 'missing']}, current_chapter='chapter_003'))
+
+    def test_stat_range(self):
+        condition = {'cultivation_range': [5, 8]}
+        self.assertTrue(check(condition, attributes={'cultivation': 5}))
+        self.assertTrue(check(condition, attributes={'cultivation': 8}))
+        self.assertFalse(check(condition, attributes={'cultivation': 4}))
+        self.assertFalse(check(condition, attributes={'cultivation': 9}))
+        self.assertTrue(check({'cultivation_range': {'min': 5}}, attributes={'cultivation': 50}))
+        self.assertFalse(check({'cultivation_range': {'max': 3}}, attributes={'cultivation': 5}))
+
+    def test_malformed_range(self):
+        with self.assertRaises(ValueError):
+            check({'cultivation_range': 5})
+
+    def test_context_keys_are_left_to_the_client(self):
+        for condition in ({'time_of_day': 'night'}, {'random_chance': 0.3}, {'exploration': True},
+                          {'weather': 'rain'}, {'action': 'cultivation'}):
+            self.assertTrue(check(condition), condition)
+        self.assertFalse(check({'time_of_day': 'night', 'item': 'a'}))
+
+    def test_legacy_keys_only_without_flat(self):
+        condition = {'needs_item': ['a'], 'intelligence': 99}
+        self.assertTrue(evaluate_condition(condition, {'inventory': ['a']}))
+        self.assertFalse(evaluate_condition(condition, {'inventory': []}))
+        self.assertFalse(check(condition, inventory=['a']))
+
+
+class CheckConditionsViewTests(TestCase):
+
+    def setUp(self):
+        self.project = GameProject.objects.create(name='测试')
+
+    def post(self, body):
+        return self.client.post(
+            f'/api/game/project/{self.project.id}/check-conditions/', json.dumps(body), content_type='application/json'
+        )
+
+    def test_list_values(self):
+        response = self.post({
+            'player_state': {'inventory': ['a', 'b'], 'completed_quests': ['q1']},
+            'conditions': {'items': {'item': ['a', 'b']}, 'quest': {'quest_completed': 'q2'}},
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], {'items': True, 'quest': False})
+
+    def test_malformed_condition_is_a_bad_request(self):
+        response = self.post({'conditions': {'x': {'cultivation_range': 'high'}}})
+        self.assertEqual(response.status_code, 400)
+
+
+class SaveDeltaTests(TestCase):
+
+    def setUp(self):
+        project = GameProject.objects.create(name='测试')
+        self.save = GameSave.objects.create(
+            project=project, slot=1, save_name='存档', current_chapter='chapter_001',
+            current_scene='scene_001', current_node='node_001'
+        )
+
+    def patch(self, path, value):
+        return save_delta(self.save, self.save.version, [{'op': 'replace', 'path': path, 'value': value}])
+
+    def test_row_fields_are_coerced(self):
+        self.patch('/play_time', '120')
+        self.save.refresh_from_db()
+        self.assertEqual((self.save.play_time, self.save.version), (120, 1))
+
+    def test_invalid_row_values_are_rejected(self):
+        for path, value in (('/play_time', 'abc'), ('/play_time', None), ('/play_time', True),
+                            ('/current_node', {'id': 1}), ('/save_name', 'x' * 101)):
+            with self.assertRaises(PatchError, msg=path):
+                self.patch(path, value)
+        self.save.refresh_from_db()
+        self.assertEqual((self.save.play_time, self.save.version), (0, 0))
+
+    def test_invalid_row_value_on_compaction(self):
+        self.save.version = SNAPSHOT_INTERVAL - 1
+        self.save.save()
+        with self.assertRaises(PatchError):
+            self.patch('/play_time', 'abc')
+
+    def test_view_answers_bad_request(self):
+        response = self.client.post(
+            f'/api/game/project/{self.save.project_id}/save/1/delta/',
+            json.dumps({'base_version': 0, 'patch': [{'op': 'replace', 'path': '/play_time', 'value': 'abc'}]}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('play_time', response.json()['error'])
@@ -4,13 +4,20 @@ from . import views
 urlpatterns = [
     path('projects/', views.list_projects, name='list_projects'),
     path('project/<int:project_id>/', views.get_game_data, name='get_game_data'),
+    path('project/<int:project_id>/manifest/', views.get_story_manifest, name='get_story_manifest'),
+    path('project/<int:project_id>/chapters/', views.prefetch_chapters, name='prefetch_chapters'),
     path('project/<int:project_id>/chapter/<str:chapter_id>/', views.get_chapter, name='get_chapter'),
+    path('project/<int:project_id>/chapter/<str:chapter_id>/story/', views.get_chapter_story_view, name='get_chapter_story'),
+    path('project/<int:project_id>/graph/', views.get_story_graph_view, name='get_story_graph'),
+    path('project/<int:project_id>/node/<str:node_id>/', views.get_story_node, name='get_story_node'),
     path('project/<int:project_id>/scene/<str:scene_id>/', views.get_scene, name='get_scene'),
     
     path('project/<int:project_id>/save/', views.save_game, name='save_game'),
+    path('project/<int:project_id>/save/<int:slot>/delta/', views.save_game_delta, name='save_game_delta'),
     path('project/<int:project_id>/load/<int:slot>/', views.load_game, name='load_game'),
     path('project/<int:project_id>/saves/', views.list_saves, name='list_saves'),
     path('project/<int:project_id>/save/<int:slot>/delete/', views.delete_save, name='delete_save'),
     
     path('project/<int:project_id>/check-condition/', views.check_condition, name='check_condition'),
+    path('project/<int:project_id>/check-conditions/', views.check_conditions, name='check_conditions'),
 ]
@@ -1,17 +1,25 @@
 import json
 import os
-from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
+from django.db import transaction
 from .models import GameProject, GameSave, Chapter, Scene, Character, Item
+from .conditions import PlayerState, compile_condition, evaluate_condition, get_scene_conditions
+from .http_cache import cached_project_response
+from .json_codec import JsonResponse, cached_fragment
+from .projects import get_project, list_project_summaries
+from .save_store import PatchError, VersionConflict, load_state, save_delta, write_snapshot
+from .story_graph import get_story_graph
+from .story_store import ensure_story_synced, get_chapter_order, get_chapter_story, get_chapters_from, get_manifest, find_node
 
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@cached_project_response
 def get_game_data(request, project_id):
     try:
-        project = GameProject.objects.get(id=project_id)
+        project = get_project(project_id, 'world_setting', 'characters', 'story_tree', 'attributes', 'items', 'exploration')
         return JsonResponse({
             'success': True,
             'data': {
@@ -32,6 +40,7 @@ def get_game_data(request, project_id):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@cached_project_response
 def get_chapter(request, project_id, chapter_id):
     try:
         chapter = Chapter.objects.get(project_id=project_id, chapter_id=chapter_id)
@@ -50,6 +59,126 @@ def get_chapter(request, project_id, chapter_id):
 
 @csrf_exempt
 @require_http_methods(["GET"])
+@cached_project_response
+def get_chapter_story_view(request, project_id, chapter_id):
+    if not ensure_story_synced(project_id):
+        return JsonResponse({'success': False, 'error': '游戏项目不存在'}, status=404)
+    
+    chapter = get_chapter_story(project_id, chapter_id)
+    if chapter is None:
+        return JsonResponse({'success': False, 'error': '章节不存在'}, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        'data': serialize_chapter_story(chapter)
+    })
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@cached_project_response
+def get_story_manifest(request, project_id):
+    if not ensure_story_synced(project_id):
+        return JsonResponse({'success': False, 'error': '游戏项目不存在'}, status=404)
+    
+    try:
+        offset = max(0, int(request.GET.get('offset', 0)))
+        limit = max(0, int(request.GET['limit'])) if 'limit' in request.GET else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': '分页参数无效'}, status=400)
+    
+    total, chapters = get_manifest(project_id, offset, limit)
+    
+    return JsonResponse({
+        'success': True,
+        'data': {
+            'total': total,
+            'offset': offset,
+            'chapters': chapters
+        }
+    })
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@cached_project_response
+def prefetch_chapters(request, project_id):
+    if not ensure_story_synced(project_id):
+        return JsonResponse({'success': False, 'error': '游戏项目不存在'}, status=404)
+    
+    try:
+        count = max(1, int(request.GET.get('count', 3)))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': '预取数量无效'}, status=400)
+    
+    chapters = get_chapters_from(project_id, request.GET.get('from'), count)
+    if chapters is None:
+        return JsonResponse({'success': False, 'error': '章节不存在'}, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        'data': [serialize_chapter_story(chapter) for chapter in chapters]
+    })
+
+
+def serialize_chapter_story(chapter):
+    return {
+        'chapter_id': chapter.chapter_id,
+        'title': chapter.title,
+        'order': chapter.order,
+        'version': chapter.content_hash,
+        'story': cached_fragment(('chapter_story', chapter.id, chapter.content_hash), lambda: chapter.story)
+    }
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@cached_project_response
+def get_story_node(request, project_id, node_id):
+    result = find_node(project_id, node_id)
+    
+    if result is None:
+        return JsonResponse({'success': False, 'error': '剧情节点不存在'}, status=404)
+    
+    graph = get_story_graph(project_id)
+    result['successors'] = graph.successors(node_id)
+    result['predecessors'] = graph.predecessors(node_id)
+    
+    return JsonResponse({
+        'success': True,
+        'data': result
+    })
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@cached_project_response
+def get_story_graph_view(request, project_id):
+    graph = get_story_graph(project_id)
+    if graph is None:
+        return JsonResponse({'success': False, 'error': '游戏项目不存在'}, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        'data': {
+            'version': graph.version,
+            'node_count': len(graph.locations),
+            'chapters': [
+                {
+                    'chapter_id': chapter_id,
+                    'entries': graph.chapter_entries[chapter_id],
+                    'exits': graph.chapter_exits[chapter_id]
+                }
+                for chapter_id, _ in graph.chapters
+            ],
+            'dangling_edges': graph.dangling_edges()
+        }
+    })
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@cached_project_response
 def get_scene(request, project_id, scene_id):
     try:
         scene = Scene.objects.get(chapter__project_id=project_id, scene_id=scene_id)
@@ -73,29 +202,70 @@ def save_game(request, project_id):
         data = json.loads(request.body)
         slot = data.get('slot', 0)
         
-        save, created = GameSave.objects.update_or_create(
-            project_id=project_id,
-            slot=slot,
-            user=request.user if request.user.is_authenticated else None,
-            defaults={
+        with transaction.atomic():
+            save, created = GameSave.objects.select_for_update().get_or_create(
+                project_id=project_id,
+                slot=slot,
+                user=request.user if request.user.is_authenticated else None,
+                defaults={'save_name': data.get('save_name', f'存档 {slot}')}
+            )
+            if data.get('base_version') is not None and save.version != data['base_version']:
+                raise VersionConflict(save.version)
+            
+            write_snapshot(save, {
                 'save_name': data.get('save_name', f'存档 {slot}'),
                 'current_chapter': data.get('current_chapter', ''),
                 'current_scene': data.get('current_scene', ''),
                 'current_node': data.get('current_node', ''),
-                'player_attributes': data.get('attributes', {}),
-                'player_inventory': data.get('inventory', []),
-                'player_flags': data.get('flags', []),
-                'relationship_data': data.get('relationships', {}),
-                'exploration_data': data.get('exploration', {}),
+                'attributes': data.get('attributes', {}),
+                'inventory': data.get('inventory', []),
+                'flags': data.get('flags', []),
+                'relationships': data.get('relationships', {}),
+                'exploration': data.get('exploration', {}),
                 'play_time': data.get('play_time', 0),
-            }
+            }, save.version + 1)
+        
+        return JsonResponse({
+            'success': True,
+            'message': '存档成功',
+            'save_id': save.id,
+            'version': save.version
+        })
+    except VersionConflict as e:
+        return JsonResponse({'success': False, 'error': str(e), 'version': e.version}, status=409)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def save_game_delta(request, project_id, slot):
+    """
+    Incremental save: {"base_version": 12, "patch": [{"op": "replace", "path": "/attributes/strength", "value": 30}]}.
+    Answers 409 with the current version when base_version is stale.
+    """
+    try:
+        data = json.loads(request.body)
+        save = GameSave.objects.get(
+            project_id=project_id,
+            slot=slot,
+            user=request.user if request.user.is_authenticated else None
         )
+        version, compacted = save_delta(save, data.get('base_version'), data.get('patch', []))
         
         return JsonResponse({
             'success': True,
             'message': '存档成功',
-            'save_id': save.id
+            'save_id': save.id,
+            'version': version,
+            'compacted': compacted
         })
+    except GameSave.DoesNotExist:
+        return JsonResponse({'success': False, 'error': '存档不存在'}, status=404)
+    except VersionConflict as e:
+        return JsonResponse({'success': False, 'error': str(e), 'version': e.version}, status=409)
+    except PatchError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
@@ -109,20 +279,13 @@ def load_game(request, project_id, slot):
             slot=slot,
             user=request.user if request.user.is_authenticated else None
         )
+        state = load_state(save)
         
         return JsonResponse({
             'success': True,
             'data': {
-                'save_name': save.save_name,
-                'current_chapter': save.current_chapter,
-                'current_scene': save.current_scene,
-                'current_node': save.current_node,
-                'attributes': save.player_attributes,
-                'inventory': save.player_inventory,
-                'flags': save.player_flags,
-                'relationships': save.relationship_data,
-                'exploration': save.exploration_data,
-                'play_time': save.play_time,
+                **state,
+                'version': save.version,
                 'updated_at': save.updated_at.isoformat()
             }
         })
@@ -136,7 +299,7 @@ def list_saves(request, project_id):
     saves = GameSave.objects.filter(
         project_id=project_id,
         user=request.user if request.user.is_authenticated else None
-    ).values('slot', 'save_name', 'current_chapter', 'play_time', 'updated_at')
+    ).values('slot', 'save_name', 'current_chapter', 'play_time', 'version', 'updated_at')
     
     return JsonResponse({
         'success': True,
@@ -161,12 +324,9 @@ def delete_save(request, project_id, slot):
 @csrf_exempt
 @require_http_methods(["GET"])
 def list_projects(request):
-    projects = GameProject.objects.all().values(
-        'id', 'name', 'description', 'analysis_status', 'analysis_progress', 'created_at'
-    )
     return JsonResponse({
         'success': True,
-        'data': list(projects)
+        'data': list(list_project_summaries())
     })
 
 
@@ -188,35 +348,39 @@ def check_condition(request, project_id):
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
-def evaluate_condition(condition, player_state):
-    if not condition:
-        return True
-    
-    attributes = player_state.get('attributes', {})
-    inventory = player_state.get('inventory', [])
-    flags = player_state.get('flags', [])
-    relationships = player_state.get('relationships', {})
-    
-    if 'needs_attribute' in condition:
-        for attr, value in condition['needs_attribute'].items():
-            if attributes.get(attr, 0) < value:
-                return False
-    
-    if 'needs_item' in condition:
-        for item in condition['needs_item']:
-            if item not in inventory:
-                return False
-    
-    if 'needs_flag' in condition:
-        for flag in condition['needs_flag']:
-            if flag not in flags:
-                return False
-    
-    
-    if 'needs_relationship' in condition:
-        for char, value in condition['needs_relationship'].items():
-            if relationships.get(char, 0) < value:
-                return False
-    
-    return True
-
+@csrf_exempt
+@require_http_methods(["POST"])
+def check_conditions(request, project_id):
+    try:
+        data = json.loads(request.body)
+        # Chapter positions are only queried if a `chapter` condition is evaluated
+        state = PlayerState(data.get('player_state', {}), lambda: get_chapter_order(project_id))
+        
+        results = {
+            key: compile_condition(condition)(state)
+            for key, condition in (data.get('conditions') or {}).items()
+        }
+        
+        chapter_id = data.get('chapter_id')
+        scene_id = data.get('scene_id')
+        if chapter_id and scene_id:
+            ensure_story_synced(project_id)
+            chapter = get_chapter_story(project_id, chapter_id)
+            scene = next(
+                (s for s in (chapter.story.get('scenes', []) if chapter else []) if s.get('scene_id') == scene_id),
+                None
+            )
+            if scene is None:
+                return JsonResponse({'success': False, 'error': '场景不存在'}, status=404)
+            
+            for key, evaluate in get_scene_conditions(project_id, chapter, scene):
+                results[key] = evaluate(state)
+        
+        return JsonResponse({
+            'success': True,
+            'results': results
+        })
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
@@ -26,6 +26,7 @@ const APIEndpoints = {
     getChapter: (chapterId) => `${GameConfig.API_BASE_URL}/game/project/${GameConfig.PROJECT_ID}/chapter/${chapterId}/`,
     getScene: (sceneId) => `${GameConfig.API_BASE_URL}/game/project/${GameConfig.PROJECT_ID}/scene/${sceneId}/`,
     saveGame: () => `${GameConfig.API_BASE_URL}/game/project/${GameConfig.PROJECT_ID}/save/`,
+    saveGameDelta: (slot) => `${GameConfig.API_BASE_URL}/game/project/${GameConfig.PROJECT_ID}/save/${slot}/delta/`,
     loadGame: (slot) => `${GameConfig.API_BASE_URL}/game/project/${GameConfig.PROJECT_ID}/load/${slot}/`,
     listSaves: () => `${GameConfig.API_BASE_URL}/game/project/${GameConfig.PROJECT_ID}/saves/`,
     deleteSave: (slot) => `${GameConfig.API_BASE_URL}/game/project/${GameConfig.PROJECT_ID}/save/${slot}/delete/`,
@@ -17,6 +17,7 @@ python auto_novel_writer.py --novel novel/斗破苍穹.txt --name "斗破苍穹
 --review-interval: 回顾间隔章节数, 默认10
 --auto-approve: 自动批准回顾, 默认False
 --resume: 从上次中断的地方继续
+--concurrency: 同时进行的章节分析请求数, 默认1
 """
 
 import os
@@ -39,19 +40,23 @@ from backend.creative.novel_processor import NovelProcessor
 from backend.creative.ai_agent import NovelAnalyzer
 from tools.progress_tracker import ProgressTracker
 
+# 运行统计，与 RUN_AUTO_*.sh 共用
+STATE_FILE = Path(__file__).resolve().parent.parent / 'auto_state.json'
+
 
 class AutoNovelWriter:
     """自动小说处理器"""
 
     def __init__(self, novel_path: str, project_name: str, api_key: str,
                  provider: str = "deepseek", review_interval: int = 10,
-                 auto_approve: bool = False):
+                 auto_approve: bool = False, concurrency: int = 1):
         self.novel_path = novel_path
         self.project_name = project_name
         self.api_key = api_key
         self.provider = provider
         self.review_interval = review_interval
         self.auto_approve = auto_approve
+        self.concurrency = concurrency
 
         # 初始化进度跟踪器
         self.tracker = ProgressTracker()
@@ -63,6 +68,9 @@ class AutoNovelWriter:
 
         # 初始化处理器
         self.processor = NovelProcessor(self.project, self.api_key, self.provider)
+        # 限流调度器按进程共享，并发请求的 429 也计入其中
+        self.scheduler = self.processor.analyzer.scheduler
+        self.quota_hits_at_start = self.scheduler.limit_hits
 
         # 统计信息
         self.stats = {
@@ -89,6 +97,22 @@ class AutoNovelWriter:
         print(f"📚 项目: {self.project_name} (ID: {project.id})")
         return project
 
+    def _save_quota_hits(self) -> int:
+        """把本次运行触发的额度限制(429)次数累加到 auto_state.json"""
+        hits = self.scheduler.limit_hits - self.quota_hits_at_start
+        if not hits:
+            return 0
+
+        try:
+            with open(STATE_FILE, 'r') as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            state = {}
+        state['quota_limit_hits'] = state.get('quota_limit_hits', 0) + hits
+        with open(STATE_FILE, 'w') as f:
+            json.dump(state, f, indent=2)
+        return hits
+
     def _print_status(self):
         """打印当前状态"""
         current = self.tracker.state['current_chapter']
@@ -184,15 +208,15 @@ class AutoNovelWriter:
 
         print("="*70 + "\n")
 
-    def _process_single_chapter(self, chunk_index: int, chunk_content: str) -> bool:
-        """处理单个章节"""
+    def _process_single_chapter(self, chunk_index: int, chunk_content: str, future) -> bool:
+        """处理单个章节（分析请求已由 analyze_ahead 提前发出）"""
         try:
             print(f"\n📖 正在处理第 {chunk_index + 1} 章...")
             print(f"   字数: {len(chunk_content)}")
 
             # 分析片段（不跳过）
             start_time = time.time()
-            result = self.processor.process_chunk(chunk_index, chunk_content)
+            result = self.processor.collect_chunk(chunk_index, chunk_content, future)
             elapsed = time.time() - start_time
 
             print(f"   ✅ 分析完成 (耗时: {elapsed:.2f}秒)")
@@ -207,15 +231,15 @@ class AutoNovelWriter:
             self.processor.generate_chapter_summary(chunk_index)
             self.processor.update_world_setting(chunk_index)
             self.processor.update_characters(chunk_index)
+            self.processor.save_checkpoint(chunk_index, chapter_mode=True)
 
             # 更新进度
             self.tracker.complete_chapter(chunk_index + 1)
             self.stats['chapters_processed'] += 1
 
-            # 保存项目状态
+            # 保存项目进度（只写进度字段，并按时间间隔合并写入）
             progress = int((chunk_index + 1) / self.tracker.state['total_chapters'] * 100)
-            self.project.analysis_progress = progress
-            self.project.save()
+            self.processor.save_progress(progress)
 
             return True
 
@@ -236,6 +260,7 @@ class AutoNovelWriter:
         print(f"🤖 AI提供商: {self.provider}")
         print(f"📊 回顾间隔: 每 {self.review_interval} 章")
         print(f"✅ 自动批准: {'是' if self.auto_approve else '否'}")
+        print(f"⚡ 并发请求数: {self.concurrency}")
 
         self._print_status()
 
@@ -248,18 +273,22 @@ class AutoNovelWriter:
             if not self._perform_review(start_chapter):
                 return
 
+        # 从最近的检查点恢复累积上下文
+        restored = self.processor.load_checkpoint(chapter_mode=True, before_index=start_chapter)
+        if restored is not None:
+            print(f"💾 已从第 {restored + 1} 章的检查点恢复上下文")
+
         print(f"\n开始从第 {start_chapter + 1} 章处理...\n")
 
         # 按章节模式读取
         try:
             chunk_index = 0
-            for chunk_index, chunk_content in self.processor.read_novel_by_chapters():
-                # 跳过已处理的章节
-                if chunk_index < start_chapter:
-                    continue
+            # 通过章节偏移索引直接跳到起始章节
+            reader = self.processor.read_novel_by_chapters(start_chapter)
 
+            for chunk_index, chunk_content, future in self.processor.analyze_ahead(reader, self.concurrency):
                 # 处理章节
-                if not self._process_single_chapter(chunk_index, chunk_content):
+                if not self._process_single_chapter(chunk_index, chunk_content, future):
                     print(f"\n⚠️  第 {chunk_index + 1} 章处理失败，是否继续？")
                     if not self.auto_approve:
                         user_input = input("输入 'y' 继续, 其他键退出: ")
@@ -309,6 +338,10 @@ class AutoNovelWriter:
             traceback.print_exc()
 
         finally:
+            # 写入尚未落盘的进度
+            self.processor.save_progress(self.project.analysis_progress, force=True)
+            quota_hits = self._save_quota_hits()
+
             # 打印最终统计
             print("\n" + "="*70)
             print("📊 最终统计")
@@ -317,6 +350,7 @@ class AutoNovelWriter:
             print(f"处理章节数: {self.stats['chapters_processed']}")
             print(f"完成回顾数: {self.stats['reviews_completed']}")
             print(f"错误次数: {len(self.stats['errors'])}")
+            print(f"额度限制: {quota_hits} 次")
             print("="*70)
 
             if self.stats['errors']:
@@ -357,6 +391,8 @@ def main():
                        help='自动批准回顾，无需人工确认')
     parser.add_argument('--resume', action='store_true',
                        help='从上次中断的地方继续')
+    parser.add_argument('--concurrency', type=int, default=1,
+                       help='同时进行的章节分析请求数 (默认: 1)')
 
     args = parser.parse_args()
 
@@ -398,7 +434,8 @@ def main():
         api_key=args.api_key or os.environ.get('DEEPSEEK_API_KEY'),
         provider=args.provider,
         review_interval=args.review_interval,
-        auto_approve=args.auto_approve
+        auto_approve=args.auto_approve,
+        concurrency=args.concurrency
     )
 
     writer.run()
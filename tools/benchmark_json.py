@@ -0,0 +1,76 @@
+import os
+import sys
+import json
+import time
+import argparse
+import django
+
+# Setup Django environment
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.config.settings')
+django.setup()
+
+from django.http import JsonResponse as DjangoJsonResponse
+from game import json_codec
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frontend', 'data')
+
+
+def measure(func, rounds):
+    func()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - started) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare JSON serialization paths on a game data payload')
+    parser.add_argument('--file', default=os.path.join(DATA_DIR, 'game_data_doupo.json'), help='JSON payload to serialize')
+    parser.add_argument('--rounds', type=int, default=200, help='Iterations per measurement')
+    args = parser.parse_args()
+
+    with open(args.file, 'rb') as f:
+        raw = f.read()
+    payload = json.loads(raw)
+    response = {'success': True, 'data': payload}
+    fragment_response = {
+        'success': True,
+        'data': {**payload, 'story_tree': json_codec.cached_fragment(('benchmark',), lambda: payload.get('story_tree'))}
+    }
+
+    orjson = json_codec.orjson
+    cases = [
+        ('django JsonResponse', lambda: DjangoJsonResponse(response)),
+        ('json_codec (orjson)', lambda: json_codec.JsonResponse(response)),
+        ('json_codec + 缓存片段', lambda: json_codec.JsonResponse(fragment_response)),
+        ('json.loads', lambda: json.loads(raw)),
+        ('json_codec.loads (orjson)', lambda: json_codec.loads(raw)),
+    ]
+
+    print(f"📦 {os.path.basename(args.file)}: {len(raw) / 1024:.0f} KB，每项 {args.rounds} 次")
+    if orjson is None:
+        print("⚠️ 未安装 orjson，json_codec 使用标准库")
+
+    results = {}
+    for name, func in cases:
+        results[name] = measure(func, args.rounds)
+
+    json_codec.orjson = None
+    try:
+        results['json_codec (标准库回退)'] = measure(lambda: json_codec.JsonResponse(response), args.rounds)
+    finally:
+        json_codec.orjson = orjson
+
+    baseline = results['django JsonResponse']
+    for name, seconds in results.items():
+        speedup = f"{baseline / seconds:6.1f}x" if 'loads' not in name else ''
+        print(f"   {name:<28} {seconds * 1000:8.3f} ms  {speedup}")
+
+    sizes = (len(DjangoJsonResponse(response).content), len(json_codec.JsonResponse(response).content))
+    print(f"\n📏 响应大小: django {sizes[0] / 1024:.0f} KB，json_codec {sizes[1] / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.config.settings')
 django.setup()
 
 from game.models import GameProject, Chapter, Scene, Character, Item
+from game.story_store import sync_story_tree
 
 def bootstrap():
     print("Bootstrapping Chapter 1...")
@@ -133,6 +134,7 @@ def bootstrap():
         }
     }
     project.save()
+    sync_story_tree(project)
 
     print("Success! Chapter 1 data injected.")
     print(f"Created characters: {xiao_yan.name}, {xiao_mei.name}")
@@ -9,6 +9,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.config.settings')
 django.setup()
 
 from game.models import GameProject, Chapter, Scene, Character, Item
+from game.story_store import save_chapters
 
 def bootstrap():
     print("Bootstrapping Chapter 10...")
@@ -117,7 +118,7 @@ def bootstrap():
     
     tree['chapters'] = chapters
     project.story_tree = tree
-    project.save()
+    save_chapters(project, ['chapter_009', 'chapter_010'])
     
     print("Success! Chapter 10 data injected.")
 
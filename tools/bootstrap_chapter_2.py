@@ -10,6 +10,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.config.settings')
 django.setup()
 
 from game.models import GameProject, Chapter, Scene, Character
+from game.story_store import save_chapters
 
 def bootstrap():
     print("Bootstrapping Chapter 2...")
@@ -223,7 +224,7 @@ def bootstrap():
         current_tree['chapters'].append(chapter_2_data)
 
     project.story_tree = current_tree
-    project.save()
+    save_chapters(project, ['chapter_001', 'chapter_002'])
 
     print("Success! Chapter 2 data injected.")
     print(f"Created characters: {xiao_zhan.name}")
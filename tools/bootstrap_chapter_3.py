@@ -9,6 +9,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.config.settings')
 django.setup()
 
 from game.models import GameProject, Chapter, Scene, Character
+from game.story_store import save_chapters
 
 def bootstrap():
     print("Bootstrapping Chapter 3...")
@@ -194,7 +195,7 @@ def bootstrap():
     
     tree['chapters'] = chapters
     project.story_tree = tree
-    project.save()
+    save_chapters(project, ['chapter_002', 'chapter_003'])
     
     print("Success! Chapter 3 data injected.")
 
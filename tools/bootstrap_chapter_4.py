@@ -9,6 +9,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.config.settings')
 django.setup()
 
 from game.models import GameProject, Chapter, Scene, Character
+from game.story_store import save_chapters
 
 def bootstrap():
     print("Bootstrapping Chapter 4...")
@@ -104,7 +105,7 @@ def bootstrap():
     
     tree['chapters'] = chapters
     project.story_tree = tree
-    project.save()
+    save_chapters(project, ['chapter_003', 'chapter_004'])
     
     print("Success! Chapter 4 data injected.")
 
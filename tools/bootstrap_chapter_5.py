@@ -9,6 +9,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.config.settings')
 django.setup()
 
 from game.models import GameProject, Chapter, Scene, Character, Item
+from game.story_store import save_chapters
 
 def bootstrap():
     print("Bootstrapping Chapter 5...")
@@ -121,7 +122,7 @@ def bootstrap():
     
     tree['chapters'] = chapters
     project.story_tree = tree
-    project.save()
+    save_chapters(project, ['chapter_004', 'chapter_005'])
     
     print("Success! Chapter 5 data injected.")
 
@@ -9,6 +9,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.config.settings')
 django.setup()
 
 from game.models import GameProject, Chapter, Scene, Character, Item
+from game.story_store import save_chapters
 
 def bootstrap():
     print("Bootstrapping Chapter 9...")
@@ -115,7 +116,7 @@ def bootstrap():
     
     tree['chapters'] = chapters
     project.story_tree = tree
-    project.save()
+    save_chapters(project, ['chapter_008', 'chapter_009'])
     
     print("Success! Chapter 9 data injected.")
 
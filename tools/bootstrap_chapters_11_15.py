@@ -9,12 +9,15 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.config.settings')
 django.setup()
 
 from game.models import GameProject, Chapter, Scene, Character, Item
+from game.story_store import save_chapters
 
 def bootstrap():
     project = GameProject.objects.first()
     if not project: return
     tree = project.story_tree
     chapters = tree.get('chapters', [])
+    positions = {c['chapter_id']: i for i, c in enumerate(chapters)}
+    touched = set()
 
     def add_chapter(ch_num, title, text, scene_id, nodes, link_from=None):
         chapter_id = f"chapter_{ch_num:03d}"
@@ -24,14 +27,15 @@ def bootstrap():
         )
         ch_data = {"chapter_id": chapter_id, "scenes": [{"scene_id": scene_id, "content": {"nodes": nodes}}]}
         
-        if link_from:
-            for ch in chapters:
-                if ch['chapter_id'] == link_from:
-                    ch['scenes'][0]['content']['nodes'][-1]['next'] = nodes[0]['node_id']
+        if link_from in positions:
+            chapters[positions[link_from]]['scenes'][0]['content']['nodes'][-1]['next'] = nodes[0]['node_id']
+            touched.add(link_from)
+        touched.add(chapter_id)
         
-        idx = next((i for i, c in enumerate(chapters) if c['chapter_id'] == chapter_id), -1)
-        if idx >= 0: chapters[idx] = ch_data
-        else: chapters.append(ch_data)
+        if chapter_id in positions: chapters[positions[chapter_id]] = ch_data
+        else:
+            positions[chapter_id] = len(chapters)
+            chapters.append(ch_data)
 
     # Ch 11: Facing Jialie Ao
     add_chapter(11, "第十一章 冲突", "萧家坊市内，冲突一触即发...", "scene_010_street", [
@@ -59,7 +63,7 @@ def bootstrap():
     ], link_from="chapter_012")
 
     project.story_tree = tree
-    project.save()
+    save_chapters(project, touched)
     print("Success! Chapters 11-15 injected.")
 
 if __name__ == "__main__":
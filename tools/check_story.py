@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import time
+import argparse
+import django
+
+# Setup Django environment
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.config.settings')
+django.setup()
+
+from game.models import GameProject, Chapter
+from game.story_analysis import StoryAnalyzer
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frontend', 'data')
+SHOW_LIMIT = 20
+
+
+def load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_chapters(args):
+    if args.project:
+        project = GameProject.objects.get(id=args.project)
+        chapters = Chapter.objects.filter(project=project).exclude(
+            content_hash=''
+        ).order_by('order', 'id').only('story')
+        if chapters.exists():
+            return [chapter.story for chapter in chapters], project.attributes or {}
+        return (project.story_tree or {}).get('chapters', []), project.attributes or {}
+
+    game_data = load_json(os.path.join(args.data_dir, args.game_data))
+    return (game_data.get('story_tree') or {}).get('chapters', []), game_data.get('attributes') or {}
+
+
+def print_section(title, entries, render):
+    if not entries:
+        return
+    print(f"\n{title} ({len(entries)})")
+    for entry in entries[:SHOW_LIMIT]:
+        print(f"   - {render(entry)}")
+    if len(entries) > SHOW_LIMIT:
+        print(f"   ... 另有 {len(entries) - SHOW_LIMIT} 项")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Static reachability / dead-end check for story data')
+    parser.add_argument('--project', type=int, help='Check a GameProject from the database instead of the JSON files')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directory holding the game data JSON files')
+    parser.add_argument('--game-data', default='game_data_doupo.json', help='Game data file inside --data-dir')
+    parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    chapters, attributes = load_chapters(args)
+    analyzer = StoryAnalyzer(
+        chapters,
+        routes=load_json(os.path.join(args.data_dir, 'story_routes.json')),
+        quests=load_json(os.path.join(args.data_dir, 'side_quests.json')),
+        events=load_json(os.path.join(args.data_dir, 'random_events.json')),
+        attributes=attributes
+    )
+    report = analyzer.analyze()
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        sys.exit(1 if report['error_count'] else 0)
+
+    print(f"📖 节点 {report['node_count']}，可达 {report['reachable_count']}（{elapsed * 1000:.0f} ms）")
+    print_section('🚫 断开的跳转', report['broken_edges'], lambda e: f"{e['from']} → {e['to']}")
+    print_section('🔁 无出口的循环', report['traps'], lambda c: ' → '.join(c))
+    print_section('🔗 无效引用', report['broken_references'], lambda r: f"{r['from']} 引用了不存在的 {r['type']} {r['to']}")
+    print_section('⛔ 条件不可达', report['infeasible'], lambda i: f"{i['type']} {i['id']}: {'；'.join(i['problems'])}")
+    print_section('⚠️ 跨场景跳转（客户端只在当前场景内查找）', report['cross_scene_edges'], lambda e: f"{e['from']} → {e['to']}")
+    print_section('👻 不可达节点', report['unreachable_nodes'], str)
+
+    if report['error_count']:
+        print(f"\n❌ 发现 {report['error_count']} 个问题")
+        sys.exit(1)
+    print("\n✅ 剧情图检查通过")
+
+
+if __name__ == "__main__":
+    main()
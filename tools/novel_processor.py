@@ -14,13 +14,14 @@ from backend.game.models import GameProject
 from backend.creative.novel_processor import NovelProcessor as BackendNovelProcessor
 
 class CLIProcessor:
-    def __init__(self, novel_path: str, project_name: str, api_key: str = None, provider: str = "deepseek", interactive: bool = False, chapter_mode: bool = False):
+    def __init__(self, novel_path: str, project_name: str, api_key: str = None, provider: str = "deepseek", interactive: bool = False, chapter_mode: bool = False, concurrency: int = 1):
         self.novel_path = novel_path
         self.project_name = project_name
         self.api_key = api_key or os.environ.get("DEEPSEEK_API_KEY")
         self.provider = provider
         self.interactive = interactive
         self.chapter_mode = chapter_mode
+        self.concurrency = concurrency
         
         if not self.api_key:
             print("WARNING: No API Key provided.")
@@ -63,7 +64,8 @@ class CLIProcessor:
                 result = processor.resume_analysis(
                     progress_callback=progress_callback,
                     stop_after_chapter=self.interactive,
-                    chapter_mode=self.chapter_mode
+                    chapter_mode=self.chapter_mode,
+                    concurrency=self.concurrency
                 )
                 
                 if result.get('status') == 'paused':
@@ -78,6 +80,7 @@ class CLIProcessor:
                     print("Game Data Generated.")
                     break
         except KeyboardInterrupt:
+            processor.save_progress(self.project.analysis_progress, force=True)
             print("\nAnalysis paused by user.")
         except Exception as e:
             print(f"\nError: {e}")
@@ -92,8 +95,9 @@ if __name__ == "__main__":
     parser.add_argument('--provider', default='deepseek', help='API Provider (deepseek/openai)')
     parser.add_argument('--interactive', action='store_true', help='Pause after each chapter to allow manual modification')
     parser.add_argument('--chapter-mode', action='store_true', help='Split content by "第X章" instead of fixed size chunks')
+    parser.add_argument('--concurrency', type=int, default=1, help='Number of chunk analysis requests kept in flight (default: 1)')
     
     args = parser.parse_args()
     
-    runner = CLIProcessor(args.novel, args.name, args.api_key, args.provider, args.interactive, args.chapter_mode)
+    runner = CLIProcessor(args.novel, args.name, args.api_key, args.provider, args.interactive, args.chapter_mode, args.concurrency)
     runner.run()
@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import time
+import argparse
+import django
+
+# Setup Django environment
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.config.settings')
+django.setup()
+
+from game.simulation import BalanceSimulator
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frontend', 'data')
+
+
+def load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def percent(value):
+    return f"{value * 100:6.2f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo playthrough and battle simulator for balance testing')
+    parser.add_argument('--players', type=int, default=200000, help='Number of simulated playthroughs (default: 200000)')
+    parser.add_argument('--batch-size', type=int, default=100000, help='Players simulated per NumPy batch')
+    parser.add_argument('--quest-rate', type=float, default=1.0, help='Chance a player takes an unlocked side quest')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible runs')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directory holding the game data JSON files')
+    parser.add_argument('--game-data', default='game_data_doupo.json', help='Game data file inside --data-dir')
+    parser.add_argument('--chapters', nargs='*', help='Chapters to print attribute distributions for (default: last)')
+    parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+    args = parser.parse_args()
+
+    game_data = load_json(os.path.join(args.data_dir, args.game_data))
+    simulator = BalanceSimulator(
+        (game_data.get('story_tree') or {}).get('chapters', []),
+        attributes=game_data.get('attributes'),
+        routes=load_json(os.path.join(args.data_dir, 'story_routes.json')),
+        quests=load_json(os.path.join(args.data_dir, 'side_quests.json')),
+        events=load_json(os.path.join(args.data_dir, 'random_events.json')),
+        battle=load_json(os.path.join(args.data_dir, 'battle_system.json')),
+        quest_rate=args.quest_rate,
+        seed=args.seed
+    )
+
+    started = time.perf_counter()
+    report = simulator.run(args.players, args.batch_size)
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print(f"🎲 模拟 {report['players']} 次通关，用时 {elapsed:.1f} 秒，卡死率 {percent(report['stuck_rate'])}")
+
+    print("\n🛤️ 路线解锁率（条件 / 含任务解锁）")
+    for route_id, rates in report['routes'].items():
+        print(f"   {route_id:<24} {percent(rates['condition'])}  {percent(rates['unlocked'])}")
+
+    print("\n⚔️ 战斗结果（胜 / 负 / 平，平均回合）")
+    for enemy_id, rates in report['battles'].items():
+        print(f"   {enemy_id:<24} {percent(rates['win_rate'])}  {percent(rates['loss_rate'])}  "
+              f"{percent(rates['draw_rate'])}  {rates['avg_rounds']:.1f}")
+
+    chapters = args.chapters or list(report['chapters'])[-1:]
+    for chapter_id in chapters:
+        print(f"\n📊 {chapter_id} 属性分布（均值 / P10 / P50 / P90）")
+        for name, dist in report['chapters'].get(chapter_id, {}).items():
+            print(f"   {name:<24} {dist['mean']:10.1f} {dist['p10']:10.1f} {dist['p50']:10.1f} {dist['p90']:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
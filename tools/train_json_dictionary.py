@@ -0,0 +1,108 @@
+import os
+import re
+import sys
+import json
+import zlib
+import argparse
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, 'frontend', 'data')
+DICTIONARY_DIR = os.path.join(ROOT, 'backend', 'game', 'dictionaries')
+
+# zlib only looks 32 KB back, so a larger dictionary is wasted
+DICTIONARY_SIZE = 32 * 1024
+TOKEN_PATTERN = re.compile(r'"[^"\\]{1,40}":|"[^"\\]{2,24}"')
+
+
+def serialize(value):
+    # Same encoding as CompressedJSONField
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def load_samples(args):
+    samples = []
+    for name in sorted(os.listdir(args.data_dir)):
+        if name.endswith('.json'):
+            with open(os.path.join(args.data_dir, name), 'r', encoding='utf-8') as f:
+                samples.append(serialize(json.load(f)))
+
+    if args.projects:
+        sys.path.append(ROOT)
+        sys.path.append(os.path.join(ROOT, 'backend'))
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.config.settings')
+        import django
+        django.setup()
+        from game.models import GameProject
+        for project in GameProject.objects.only('story_tree', 'characters', 'world_setting'):
+            samples.append(serialize(project.story_tree))
+            samples.append(serialize(project.characters))
+            samples.append(serialize(project.world_setting))
+    return samples
+
+
+def build_dictionary(samples, size=DICTIONARY_SIZE):
+    """Most frequent keys and short strings, most valuable last so they sit closest to the data."""
+    counts = Counter()
+    for sample in samples:
+        counts.update(TOKEN_PATTERN.findall(sample))
+
+    scored = sorted(
+        ((count * len(token.encode('utf-8')), token) for token, count in counts.items() if count > 1),
+        reverse=True
+    )
+    chosen = []
+    used = 0
+    for _, token in scored:
+        encoded = token.encode('utf-8')
+        if used + len(encoded) > size:
+            break
+        chosen.append(encoded)
+        used += len(encoded)
+    return b''.join(reversed(chosen))
+
+
+def ratio(samples, dictionary):
+    raw = compressed = 0
+    for sample in samples:
+        data = sample.encode('utf-8')
+        compressor = zlib.compressobj(6, zdict=dictionary) if dictionary else zlib.compressobj(6)
+        raw += len(data)
+        compressed += len(compressor.compress(data) + compressor.flush())
+    return raw / max(compressed, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the compression dictionary used by CompressedJSONField')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directory of sample JSON files')
+    parser.add_argument('--projects', action='store_true', help='Also sample story trees from the database')
+    parser.add_argument('--dry-run', action='store_true', help='Only report the compression ratio')
+    args = parser.parse_args()
+
+    samples = load_samples(args)
+    dictionary = build_dictionary(samples)
+    print(f"📚 样本 {len(samples)} 个，字典 {len(dictionary) / 1024:.1f} KB")
+    print(f"   压缩比: 无字典 {ratio(samples, b''):.2f}x，有字典 {ratio(samples, dictionary):.2f}x")
+    print(f"   小数据 (<2KB 片段) 压缩比: 无字典 {ratio([s[:2048] for s in samples], b''):.2f}x，"
+          f"有字典 {ratio([s[:2048] for s in samples], dictionary):.2f}x")
+    if args.dry_run:
+        return
+
+    # Stored values name their dictionary by id, so a new dictionary always gets a new id
+    os.makedirs(DICTIONARY_DIR, exist_ok=True)
+    existing = [
+        int(name[len('json_v'):-len('.bin')]) for name in os.listdir(DICTIONARY_DIR)
+        if name.startswith('json_v') and name.endswith('.bin')
+    ]
+    version = max(existing, default=0) + 1
+    if version > 255:
+        print("❌ 字典编号已用完")
+        sys.exit(1)
+    path = os.path.join(DICTIONARY_DIR, f'json_v{version}.bin')
+    with open(path, 'wb') as f:
+        f.write(dictionary)
+    print(f"✅ 已写入 {os.path.relpath(path, ROOT)}")
+
+
+if __name__ == "__main__":
+    main()